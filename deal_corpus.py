@@ -0,0 +1,149 @@
+"""
+DeepPoker Project
+
+This module contains a corpus of pre-generated deals (the dealer, both players' hands and the community cards of a
+round) stored in a compact binary file, so benchmarks, duplicate matches and regression tests can play the exact same
+deals on any machine without spending time on random numbers.
+
+A corpus file starts with an 8 byte magic string and the number of deals (8 byte little endian int), followed by
+DEAL_SIZE bytes per deal: the dealer (1 or 2) and then the codes (see poker_game.CODE_TO_CARD) of the 9 cards in the
+order they are dealt (see PokerGame.load_deck).
+
+This file is Copyright (c) 2023 Francis Madarang, Sungjin Hong, Sean Kwee, Yenah Lee
+"""
+from __future__ import annotations
+from typing import Iterator, Optional, Union
+import mmap
+import random
+import struct
+from poker_game import CODE_TO_CARD
+from game_runner import Deal
+
+MAGIC = b'DPDEALS1'
+HEADER = struct.Struct('<8sQ')
+DEAL_SIZE = 10
+
+
+def write_corpus(destination: str, n: int, seed: Optional[int] = None, chunk_size: int = 100000) -> None:
+    """
+    Generates n random deals and writes them to a corpus file, overriding its contents. The same seed always generates
+    the same corpus.
+
+    Parameters:
+    - destination: the file to write to
+    - n: the number of deals
+    - seed: the seed of the deals; random if None
+    - chunk_size: the number of deals generated before they are written to the file
+
+    Preconditions:
+    - n >= 0
+    - chunk_size >= 1
+    """
+    generator = random.Random(seed)
+    with open(destination, 'wb') as writer:
+        writer.write(HEADER.pack(MAGIC, n))
+        for start in range(0, n, chunk_size):
+            chunk = bytearray()
+            for _ in range(min(chunk_size, n - start)):
+                chunk.append(generator.randint(1, 2))
+                chunk.extend(generator.sample(range(52), 9))
+            writer.write(chunk)
+
+
+class DealCorpus:
+    """
+    A read-only corpus of deals, memory-mapped from its file so opening it is instant and every process reading the
+    same file shares one copy of it in memory. A corpus is pickled as the name of its file, so it can be passed to
+    worker processes cheaply, where it is mapped again.
+
+    Instance Attributes:
+    - file: the name of the corpus file
+    - size: the number of deals in the corpus
+
+    Representation Invariants:
+    - self.size >= 0
+    """
+    file: str
+    size: int
+    _map: Optional[mmap.mmap]
+
+    def __init__(self, file: str) -> None:
+        """
+        Initializer for the corpus stored in the given file.
+
+        Preconditions:
+        - file is a corpus file written by write_corpus
+        """
+        self.file = file
+        with open(file, 'rb') as reader:
+            magic, self.size = HEADER.unpack(reader.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f'{file} is not a deal corpus')
+            if self.size > 0:
+                self._map = mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._map = None  # an empty file cannot be mapped
+
+    def __len__(self) -> int:
+        """
+        Returns the number of deals in the corpus.
+        """
+        return self.size
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Deal, list[Deal]]:
+        """
+        Returns the deal at the given index, or a list of the deals in the given slice.
+        """
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.size))]
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError('deal index out of range')
+        start = HEADER.size + index * DEAL_SIZE
+        record = self._map[start:start + DEAL_SIZE]
+        return (record[0], tuple(CODE_TO_CARD[code] for code in record[1:]))
+
+    def __iter__(self) -> Iterator[Deal]:
+        """
+        Yields every deal in the corpus in order.
+        """
+        for i in range(self.size):
+            yield self[i]
+
+    def __reduce__(self) -> tuple:
+        """
+        Pickles the corpus as the name of its file.
+        """
+        return (DealCorpus, (self.file,))
+
+    def __enter__(self) -> DealCorpus:
+        """
+        Returns the corpus, so it can be used in a with statement that closes it.
+        """
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """
+        Closes the corpus at the end of a with statement.
+        """
+        self.close()
+
+    def close(self) -> None:
+        """
+        Unmaps the corpus file. The corpus cannot be read afterwards.
+        """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+if __name__ == '__main__':
+    write_corpus('deals.bin', 1000000, seed=0)
+
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'typing', 'mmap', 'random', 'struct', 'poker_game', 'game_runner'],
+        'allowed-io': ['write_corpus', 'DealCorpus.__init__'],
+        'max-line-length': 120
+    })
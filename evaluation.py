@@ -0,0 +1,249 @@
+"""
+DeepPoker Project
+
+This module contains an evaluation of one playstyle against another that plays duplicate deals in parallel batches and
+stops as soon as the result is statistically decided, instead of playing a fixed number of games.
+
+This file is Copyright (c) 2023 Francis Madarang, Sungjin Hong, Sean Kwee, Yenah Lee
+"""
+from __future__ import annotations
+from typing import Callable, Iterable, Iterator, Optional
+import itertools
+import math
+import time
+from statistics import NormalDist
+from player import Player
+from game_runner import Deal, iter_duplicate, random_deal
+from poker_statistics import mean_interval, sprt_bounds, sprt_llr, Z_95
+
+# the stop rules of an evaluation
+SPRT_RULE = 'sprt'
+INTERVAL_RULE = 'interval'
+
+# the decisions of an evaluation
+PLAYER1_BETTER = 'player 1 is better'
+PLAYER2_BETTER = 'player 2 is better'
+EQUAL = 'the players are equal'
+UNDECIDED = 'undecided'
+
+
+class Evaluation:
+    """
+    A sequential evaluation of player 1 against player 2.
+
+    Every sample is player 1's score on a duplicate deal (see game_runner.run_duplicate), averaged over both seats,
+    where a win is 1, a tie is 0.5 and a loss is 0. After every batch, the stop rule checks whether the result is
+    decided:
+    - SPRT_RULE: a sequential probability ratio test of 'player 1 scores 0.5 - margin' against 'player 1 scores
+      0.5 + margin', with error rates alpha and beta. It stops after the fewest samples on average, but only decides
+      which player is better.
+    - INTERVAL_RULE: stops once the confidence interval of player 1's score excludes 0.5 (a player is better) or lies
+      within 0.5 +- margin (the players are equal). The interval is checked after every batch, so each check uses a
+      1 - alpha / max_looks interval (a Bonferroni correction over the most checks the evaluation can make), which keeps
+      the probability of any wrong stop across all checks below alpha.
+
+    Instance Attributes:
+    - player1_factory: picklable function with no parameters that returns player 1's equivalent player
+    - player2_factory: same as player1_factory but for player 2
+    - stop_rule: SPRT_RULE or INTERVAL_RULE
+    - margin: the smallest difference in score from 0.5 that is worth detecting
+    - alpha: the probability of deciding player 1 is better when player 2 is better by margin (and, for the interval
+      rule, the probability of any interval checked not containing the true score)
+    - beta: the probability of deciding player 2 is better when player 1 is better by margin
+    - all_in_runouts: if not None, all-ins are scored by player 1's expected share of the pool over up to this many
+      runouts (see PokerGame.all_in_runouts), which lowers the variance of the scores
+    - max_looks: the most times the interval rule can be checked, given the max_deals, batch_size and min_deals of
+      run (the largest over every run of a resumed evaluation)
+    - deals: the number of duplicate deals played so far
+    - played_through: the index in the deals given to run before which every deal has been played
+    - played_beyond: the indices in the deals given to run of the deals played at or after played_through (deals come
+      back from the workers out of order, and an evaluation stopped early leaves gaps)
+    - total: the sum of player 1's scores so far
+    - total_squares: the sum of the squares of player 1's scores so far
+    - seconds: the seconds spent playing so far
+    - decision: PLAYER1_BETTER, PLAYER2_BETTER, EQUAL or UNDECIDED
+
+    Representation Invariants:
+    - self.stop_rule in {SPRT_RULE, INTERVAL_RULE}
+    - 0 < self.margin < 0.5
+    - 0 < self.alpha < 1 and 0 < self.beta < 1
+    - self.max_looks >= 1
+    - self.deals >= 0
+    - all(index > self.played_through for index in self.played_beyond)
+    - self.decision in {PLAYER1_BETTER, PLAYER2_BETTER, EQUAL, UNDECIDED}
+    """
+    player1_factory: Callable[[], Player]
+    player2_factory: Callable[[], Player]
+    stop_rule: str
+    margin: float
+    alpha: float
+    beta: float
+    all_in_runouts: Optional[int]
+    max_looks: int
+    deals: int
+    played_through: int
+    played_beyond: set[int]
+    total: float
+    total_squares: float
+    seconds: float
+    decision: str
+
+    def __init__(self, player1_factory: Callable[[], Player], player2_factory: Callable[[], Player],
+                 stop_rule: str = SPRT_RULE, margin: float = 0.05, alpha: float = 0.05, beta: float = 0.05,
+                 all_in_runouts: Optional[int] = None) -> None:
+        """
+        Initializer for an evaluation of player 1 against player 2.
+
+        Preconditions:
+        - stop_rule in {SPRT_RULE, INTERVAL_RULE}
+        - 0 < margin < 0.5
+        - 0 < alpha < 1 and 0 < beta < 1
+        - all_in_runouts is None or all_in_runouts >= 1
+        """
+        self.player1_factory = player1_factory
+        self.player2_factory = player2_factory
+        self.stop_rule = stop_rule
+        self.margin = margin
+        self.alpha = alpha
+        self.beta = beta
+        self.all_in_runouts = all_in_runouts
+        self.max_looks = 1
+        self.deals = 0
+        self.played_through = 0
+        self.played_beyond = set()
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.seconds = 0.0
+        self.decision = UNDECIDED
+
+    def __str__(self) -> str:
+        """
+        Summarizes the result of the evaluation so far.
+        """
+        score, low, high = self.interval()
+        output_msg = f'{self.decision} after {self.deals} duplicate deals ({2 * self.deals} games) in ' \
+                     f'{self.seconds:.1f}s\n' \
+                     f'Player 1 score: {score:.4f} [{low:.4f}, {high:.4f}]\n'
+        if self.stop_rule == SPRT_RULE:
+            lower, upper = sprt_bounds(self.alpha, self.beta)
+            output_msg += f'Log-likelihood ratio: {self.llr():.3f} (bounds {lower:.3f}, {upper:.3f})\n'
+        return output_msg
+
+    def run(self, max_deals: int = 100000, workers: Optional[int] = None, batch_size: int = 100,
+            min_deals: int = 100, deals: Optional[Iterable[Deal]] = None) -> str:
+        """
+        Plays duplicate deals until the result is decided or max_deals deals have been played, and returns the
+        decision.
+
+        Parameters:
+        - max_deals: the most deals to play before giving up (leaving the result undecided)
+        - workers: the number of worker processes (defaults to the number of cores); 1 plays in this process
+        - batch_size: the number of deals sent to a worker at a time; the stop rule is checked after every batch
+        - min_deals: the number of deals to play before the stop rule is first checked, so the variance of the scores
+          is estimated well enough
+        - deals: the deals to play (such as a deal_corpus.DealCorpus), skipping the deals of it already played by
+          earlier runs, so an evaluation can be resumed with the same deals; if None, random deals are played
+
+        Preconditions:
+        - max_deals >= 0
+        - workers is None or workers >= 1
+        - batch_size >= 1
+        - min_deals >= 2
+        """
+        start = time.perf_counter()
+        # the stop rule is checked after the batch that reaches min_deals and after every batch after it
+        self.max_looks = max(self.max_looks, math.ceil(max(0, max_deals - min_deals) / batch_size) + 1)
+        positions = []  # the index in deals of every deal sent to iter_duplicate, in order
+        if deals is None:
+            deals = (random_deal() for _ in range(max(0, max_deals - self.deals)))
+        else:
+            deals = itertools.islice(self._unplayed(deals, positions), max(0, max_deals - self.deals))
+        batches = iter_duplicate(self.player1_factory, self.player2_factory, deals, workers, batch_size,
+                                 self.all_in_runouts)
+        try:
+            for first, batch in batches:
+                if positions:
+                    self._mark_played(positions[first:first + len(batch)])
+                for score, _ in batch:
+                    self.deals += 1
+                    self.total += score
+                    self.total_squares += score * score
+                if self.deals >= min_deals:
+                    self.decision = self._decide()
+                    if self.decision != UNDECIDED:
+                        break
+        finally:
+            batches.close()  # cancels the batches that have not started and shuts down the workers
+            self.seconds += time.perf_counter() - start
+        return self.decision
+
+    def _unplayed(self, deals: Iterable[Deal], positions: list[int]) -> Iterator[Deal]:
+        """
+        Yields the deals that have not been played yet, appending the index of each in deals to positions.
+        """
+        for i, deal in enumerate(itertools.islice(deals, self.played_through, None), self.played_through):
+            if i not in self.played_beyond:
+                positions.append(i)
+                yield deal
+
+    def _mark_played(self, indices: list[int]) -> None:
+        """
+        Records that the deals at the given indices in the deals given to run have been played.
+        """
+        self.played_beyond.update(indices)
+        while self.played_through in self.played_beyond:
+            self.played_beyond.remove(self.played_through)
+            self.played_through += 1
+
+    def interval(self) -> tuple[float, float, float]:
+        """
+        Returns player 1's mean score so far and the bounds of its confidence interval (a 95% interval for the SPRT
+        rule, and a 1 - alpha / max_looks interval for the interval rule).
+        """
+        return mean_interval(self.total, self.total_squares, self.deals, self._z())
+
+    def llr(self) -> float:
+        """
+        Returns the log-likelihood ratio of player 1 being better by margin over player 2 being better by margin.
+        """
+        return sprt_llr(self.total, self.total_squares, self.deals, 0.5 - self.margin, 0.5 + self.margin)
+
+    def _decide(self) -> str:
+        """
+        Returns the decision of the stop rule given the results so far.
+        """
+        if self.stop_rule == SPRT_RULE:
+            lower, upper = sprt_bounds(self.alpha, self.beta)
+            llr = self.llr()
+            if llr >= upper:
+                return PLAYER1_BETTER
+            elif llr <= lower:
+                return PLAYER2_BETTER
+            return UNDECIDED
+
+        _, low, high = self.interval()
+        if low > 0.5:
+            return PLAYER1_BETTER
+        elif high < 0.5:
+            return PLAYER2_BETTER
+        elif 0.5 - self.margin <= low and high <= 0.5 + self.margin:
+            return EQUAL
+        return UNDECIDED
+
+    def _z(self) -> float:
+        """
+        Returns the z-score of the confidence intervals of this evaluation.
+        """
+        if self.stop_rule == SPRT_RULE:
+            return Z_95
+        return NormalDist().inv_cdf(1 - self.alpha / (2 * self.max_looks))
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'typing', 'itertools', 'math', 'time', 'statistics', 'player', 'game_runner',
+                          'poker_statistics'],
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120
+    })
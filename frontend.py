@@ -3,7 +3,7 @@ DeepPoker Project
 
 File that runs the UI
 """
-from typing import Any
+from typing import Any, Optional
 from time import sleep
 import random
 import pygame
@@ -11,6 +11,7 @@ import pygame.gfxdraw
 import python_ta
 import player
 from poker_game import PokerGame
+from hand_history import HandHistoryWriter
 from NaivePlayer import NaivePlayer
 from tree_player import TreePlayer
 
@@ -114,9 +115,10 @@ class Button:
 
 
 def run_round2(infos: list[Any], buttons: list[Button], inputs: list[Any],
-               players: list[player.Player], font: pygame.font.Font) -> list[PokerGame]:
+               players: list[player.Player], font: pygame.font.Font,
+               history: Optional[HandHistoryWriter] = None) -> list[PokerGame]:
     """
-    Simulates a round of Poker Game
+    Simulates a round of Poker Game, writing it to the given hand history (if there is one)
     """
     screen = infos[0]
     card_images = infos[1]
@@ -396,6 +398,9 @@ def run_round2(infos: list[Any], buttons: list[Button], inputs: list[Any],
             game.last_bet = 0
         game_states_so_far.append(game.copy())
 
+    if history is not None:
+        history.write(game.get_move_sequence(), [state.to_compact() for state in game_states_so_far])
+
     screen.fill((0, 0, 0))
     pygame.display.flip()
 
@@ -561,7 +566,8 @@ pygame.quit()
 #
 python_ta.check_all(config={
     'max-line-length': 120,
-    'extra-imports': ['pygame', 'random', 'pygame.gfxdraw', 'player', 'poker_game', 'NaivePlayer', 'time'],
+    'extra-imports': ['pygame', 'random', 'pygame.gfxdraw', 'player', 'poker_game', 'NaivePlayer', 'time',
+                      'hand_history'],
     'allowed-io': ['make_move', 'HumanPlayer', 'run_round2'],
     'generated-members': ['pygame.*'],
     'disable': ['E9997', 'E9992']
@@ -0,0 +1,293 @@
+"""
+DeepPoker Project
+
+This module contains a frozen, read-only form of a game tree for playing with a trained tree. A GameTree is compiled
+into a few flat arrays, one entry per node, with the children of every node next to each other and sorted by their
+classes of action: finding a subtree is a binary search over a short run of an array, the best subtree of every node is
+chosen once when the tree is compiled, and the whole tree takes a small fraction of the memory of its GameTree nodes.
+
+A frozen tree can be saved to a flat tree file and memory-mapped from it (see open_frozen_tree), so a player can start
+with a tree of any size at once: the arrays are read in place from the file, pages are only loaded as the paths they
+hold are visited, and every process playing with the same file shares one copy of it in memory. A flat tree file
+starts with an 8 byte magic string, the number of nodes (8 byte little endian int) and the vocabulary of classes of
+action (see tree_file.write_vocabulary), padded to a multiple of 8 bytes, followed by each array of the FlatTree in
+order, with 8 bytes per node in the byte order of the machine that wrote it.
+
+This file is Copyright (c) 2023 Francis Madarang, Sungjin Hong, Sean Kwee, Yenah Lee
+"""
+from __future__ import annotations
+from array import array
+from bisect import bisect_left
+from collections import deque
+from typing import Optional
+import mmap
+import struct
+from poker_game import Move, PokerGame
+from game_tree import GameTree, TAGS
+from tree_file import read_vocabulary, write_vocabulary
+
+FLAT_MAGIC = b'DPFLAT01'
+NODE_COUNT = struct.Struct('<Q')
+# the arrays of a FlatTree, in the order they are stored in a flat tree file, and their type codes
+ARRAYS = [('classes_of_action', 'Q'), ('first_child', 'q'), ('child_count', 'q'), ('best_child', 'q'),
+          ('good_outcomes_in_route', 'q'), ('total_games_in_route', 'q')]
+
+_tagger = GameTree()  # game tree object to access the methods that compute classes of action
+
+
+class FlatTree:
+    """
+    The nodes of a compiled game tree, stored as parallel arrays indexed by node. Node 0 is the root, and the nodes are
+    in breadth first order, so the children of a node are the child_count[i] nodes starting at first_child[i], sorted by
+    their classes of action.
+
+    Instance Attributes:
+    - classes_of_action: the classes of action of each node (0 for the root)
+    - first_child: the index of the first child of each node
+    - child_count: the number of children of each node
+    - best_child: the index of the child with the highest confidence value of each node, or -1 if it has no children
+    - good_outcomes_in_route: the good outcomes in the route of each node
+    - total_games_in_route: the amount of games in the route of each node
+    - file: the flat tree file the arrays are mapped from, or None if they are in memory
+
+    The arrays are array.arrays, or memoryviews of the mapped file if file is not None.
+
+    Representation Invariants:
+    - all arrays have the same length, which is at least 1
+    - all(self.classes_of_action[i] < self.classes_of_action[i + 1] for every two consecutive children of a node)
+    - all(self.best_child[i] == -1 or self.first_child[i] <= self.best_child[i]
+          < self.first_child[i] + self.child_count[i] for every node i)
+    """
+    classes_of_action: array
+    first_child: array
+    child_count: array
+    best_child: array
+    good_outcomes_in_route: array
+    total_games_in_route: array
+    file: Optional[str]
+    _map: Optional[mmap.mmap]
+
+    def __init__(self, file: Optional[str] = None) -> None:
+        """
+        Initializer for a flat tree with no nodes, or for the flat tree mapped from the given flat tree file.
+
+        Preconditions:
+        - file is None or file was written by save_frozen_tree
+        """
+        self.file = file
+        self._map = None
+        if file is None:
+            for name, typecode in ARRAYS:
+                setattr(self, name, array(typecode))
+        else:
+            self._open(file)
+
+    def _open(self, file: str) -> None:
+        """
+        Maps the arrays of this tree from a flat tree file.
+        """
+        with open(file, 'rb') as reader:
+            if reader.read(len(FLAT_MAGIC)) != FLAT_MAGIC:
+                raise ValueError(f'{file} is not a flat tree file')
+            size = NODE_COUNT.unpack(reader.read(NODE_COUNT.size))[0]
+            if read_vocabulary(reader) != TAGS:
+                # the classes of action cannot be translated in place, so the tree has to be frozen again
+                raise ValueError(f'{file} was written with different classes of action')
+            offset = -(-reader.tell() // 8) * 8
+            self._map = mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._map)
+        for name, typecode in ARRAYS:
+            setattr(self, name, buffer[offset:offset + 8 * size].cast(typecode))
+            offset += 8 * size
+
+    def __len__(self) -> int:
+        """
+        Returns the number of nodes in the tree.
+        """
+        return len(self.classes_of_action)
+
+    def __getstate__(self) -> dict:
+        """
+        Returns the state of the tree to pickle: only the name of its file if it is mapped from a file, so it can be
+        passed to worker processes cheaply, where it is mapped again.
+        """
+        if self.file is not None:
+            return {'file': self.file}
+        return {name: getattr(self, name) for name, _ in ARRAYS}
+
+    def __setstate__(self, state: dict) -> None:
+        """
+        Restores the tree from a state returned by __getstate__.
+        """
+        self.__init__(state.get('file'))
+        for name, _ in ARRAYS:
+            if name in state:
+                setattr(self, name, state[name])
+
+    def close(self) -> None:
+        """
+        Unmaps the file of this tree, if it is mapped from one. The tree cannot be read afterwards.
+        """
+        if self._map is not None:
+            for name, _ in ARRAYS:
+                getattr(self, name).release()
+            self._map.close()
+            self._map = None
+
+
+class FrozenGameTree:
+    """
+    A node of a compiled game tree. It can be followed like the GameTree it was compiled from (see find_subtree and
+    best_subtree), but cannot be changed. Every node of a compiled tree shares the same FlatTree.
+
+    Instance Attributes:
+    - flat: the arrays of the compiled tree
+    - index: the index of this node in the arrays of the compiled tree
+
+    Representation Invariants:
+    - 0 <= self.index < len(self.flat)
+    """
+    flat: FlatTree
+    index: int
+
+    __slots__ = ('flat', 'index')
+
+    def __init__(self, flat: FlatTree, index: int = 0) -> None:
+        """
+        Initializer for the node at the given index of a compiled tree.
+
+        Preconditions:
+        - 0 <= index < len(flat)
+        """
+        self.flat = flat
+        self.index = index
+
+    @property
+    def classes_of_action(self) -> Optional[int]:
+        """
+        The classes of action of this node, or None for the root.
+        """
+        return None if self.index == 0 else self.flat.classes_of_action[self.index]
+
+    @property
+    def good_outcomes_in_route(self) -> int:
+        """
+        The good outcomes in the route of this node.
+        """
+        return self.flat.good_outcomes_in_route[self.index]
+
+    @property
+    def total_games_in_route(self) -> int:
+        """
+        The amount of games in the route of this node.
+        """
+        return self.flat.total_games_in_route[self.index]
+
+    @property
+    def move_confidence_value(self) -> float:
+        """
+        The confidence value of this node, as in GameTree.
+        """
+        total = self.flat.total_games_in_route[self.index]
+        return 0.0 if total == 0 else self.flat.good_outcomes_in_route[self.index] / total
+
+    def find_subtree(self, classes_of_action: int) -> Optional[FrozenGameTree]:
+        """
+        Returns the subtree of this tree for the given classes of action, or None if this tree has not encountered them.
+        """
+        flat = self.flat
+        start = flat.first_child[self.index]
+        end = start + flat.child_count[self.index]
+        i = bisect_left(flat.classes_of_action, classes_of_action, start, end)
+        if i < end and flat.classes_of_action[i] == classes_of_action:
+            return FrozenGameTree(flat, i)
+        return None
+
+    def best_subtree(self) -> Optional[FrozenGameTree]:
+        """
+        Returns the subtree with the highest confidence value (the one GameTree.best_subtree would return), or None if
+        this tree has no subtrees.
+        """
+        best = self.flat.best_child[self.index]
+        return None if best == -1 else FrozenGameTree(self.flat, best)
+
+    def get_classes_of_action(self, move: Move, game_state: PokerGame, following: int, evaluated: bool,
+                              evaluate_move: bool = True) -> int:
+        """
+        Returns the classes of action of a move, as in GameTree.get_classes_of_action.
+        """
+        return _tagger.get_classes_of_action(move, game_state, following, evaluated, evaluate_move)
+
+
+def freeze_tree(tree: GameTree) -> FrozenGameTree:
+    """
+    Returns the root of a frozen copy of the given game tree.
+
+    Preconditions:
+    - tree.classes_of_action is None
+    """
+    flat = FlatTree()
+    flat.classes_of_action.append(0)
+    flat.good_outcomes_in_route.append(tree.good_outcomes_in_route)
+    flat.total_games_in_route.append(tree.total_games_in_route)
+    queue = deque([tree])
+    while queue:
+        node = queue.popleft()
+        best = node.best_subtree()
+        first = len(flat.classes_of_action)
+        flat.first_child.append(first)
+        flat.child_count.append(len(node.subtrees))
+        flat.best_child.append(-1)
+        for offset, classes_of_action in enumerate(sorted(node.subtrees)):
+            subtree = node.subtrees[classes_of_action]
+            if subtree is best:
+                flat.best_child[-1] = first + offset
+            flat.classes_of_action.append(classes_of_action)
+            flat.good_outcomes_in_route.append(subtree.good_outcomes_in_route)
+            flat.total_games_in_route.append(subtree.total_games_in_route)
+            queue.append(subtree)
+    return FrozenGameTree(flat)
+
+
+def save_frozen_tree(tree: FrozenGameTree, destination: str) -> None:
+    """
+    Writes a frozen tree to a flat tree file, overriding its contents, so it can be opened with open_frozen_tree.
+
+    Preconditions:
+    - tree.index == 0
+    """
+    flat = tree.flat
+    with open(destination, 'wb') as writer:
+        writer.write(FLAT_MAGIC + NODE_COUNT.pack(len(flat)))
+        header_size = len(FLAT_MAGIC) + NODE_COUNT.size + write_vocabulary(writer)
+        writer.write(bytes(-header_size % 8))
+        for name, _ in ARRAYS:
+            writer.write(getattr(flat, name))
+
+
+def open_frozen_tree(file: str) -> FrozenGameTree:
+    """
+    Returns the root of the frozen tree in a flat tree file, mapped from the file instead of read into memory.
+
+    Preconditions:
+    - file was written by save_frozen_tree on a machine with the same byte order
+    """
+    return FrozenGameTree(FlatTree(file))
+
+
+def is_flat_tree_file(file: str) -> bool:
+    """
+    Returns whether the given file is a flat tree file.
+    """
+    with open(file, 'rb') as reader:
+        return reader.read(len(FLAT_MAGIC)) == FLAT_MAGIC
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'array', 'bisect', 'collections', 'typing', 'mmap', 'struct', 'poker_game',
+                          'game_tree', 'tree_file'],
+        'allowed-io': ['FlatTree._open', 'save_frozen_tree', 'is_flat_tree_file'],
+        'max-line-length': 120
+    })
@@ -6,10 +6,17 @@ and with no restrictions on raise values.
 
 This file is Copyright (c) 2023 Francis Madarang, Sungjin Hong, Sean Kwee, Yenah Lee
 """
-from poker_game import PokerGame
-from player import Player, NaivePlayer, TestingPlayer
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Iterable, Iterator, Optional
+import copy
+import itertools
+import os
 import random
-import python_ta
+from poker_game import PokerGame, Card, Move, CompactState, CODE_TO_CARD, seed_runouts
+from poker_statistics import mean_interval
+from hand_history import HandHistoryWriter
+from player import Player, NaivePlayer, TestingPlayer
 
 # STATICS FOR MOVE CODES
 FOLD_CODE = 0
@@ -22,8 +29,29 @@ ALL_IN_CODE = 5
 NUM_TO_ACTION = {FOLD_CODE: 'Fold', CHECK_CODE: 'Check', CALL_CODE: 'Call',
                  BET_CODE: 'Bet', RAISE_CODE: 'Raise', ALL_IN_CODE: 'All-in'}
 
+# Types of events yielded by iter_round
+DEAL_EVENT = 'deal'
+ACTION_EVENT = 'action'
+STAGE_EVENT = 'stage'
+SHOWDOWN_EVENT = 'showdown'
+END_EVENT = 'end'
+
+# (event type, ...) tuples yielded by iter_round
+Event = tuple[Any, ...]
+
+# (dealer, cards in dealing order) of a pre-generated round; see PokerGame.load_deck for the order of the cards
+Deal = tuple[int, tuple[Card, ...]]
+
+# (winner, pool, move sequence, compact game states) of a simulated round
+HandResult = tuple[Optional[int], int, list[Move], list[CompactState]]
+
+# players used by the current worker process of run_rounds (one template per seat, made once per worker)
+_worker_players = []
+
 
-def run_round(player1: Player, player2: Player, should_print: bool = True) -> list[PokerGame]:
+def run_round(player1: Player, player2: Player, should_print: bool = True, record: bool = True,
+              deal: Optional[Deal] = None, all_in_runouts: Optional[int] = None,
+              history: Optional[HandHistoryWriter] = None) -> list[PokerGame]:
     """
     Simulates a round of poker (one game from Pre-flop to showdown)
 
@@ -31,17 +59,89 @@ def run_round(player1: Player, player2: Player, should_print: bool = True) -> li
     - player1: player1's equivalent player
     - player2: player2's equivalent player
     - should_print: if the round should be printed.
+    - record: if a copy of every game state should be kept; otherwise only the final game state is returned
+    - deal: the dealer and cards of the round; if None, they are random
+    - all_in_runouts: if not None, an all-in is also settled by its expected value over up to this many runouts (see
+      PokerGame.all_in_runouts)
+    - history: if not None, the round is also written to this hand history
 
     Preconditions:
         - player1 and player2 are valid Player objects constructed from the Player parent class in Parameterspy
     """
-    dealer = random.randint(1, 2)
     game = PokerGame()
+    game_states_so_far = []
+    compact_states = []
+    for event in iter_round(player1, player2, game, deal=deal, all_in_runouts=all_in_runouts):
+        if event[0] == ACTION_EVENT and should_print:
+            move = event[3]
+            print(f'[{event[1]}] Player {event[2] + 1} {NUM_TO_ACTION[move[0]]}s'
+                  f'{"" if move[0] not in {RAISE_CODE, BET_CODE}else " "+str(move[1])}')
+        if record and event[0] in {DEAL_EVENT, ACTION_EVENT}:
+            game_states_so_far.append(game.copy())
+        if history is not None and event[0] in {DEAL_EVENT, ACTION_EVENT}:
+            compact_states.append(game.to_compact())
+
+    if history is not None:
+        history.write(game.get_move_sequence(), compact_states)
+
+    # print(f'{game.player1_moves} {game.player2_moves}')
+    # print(game)
+
+    return game_states_so_far if record else [game]
+
+
+def iter_round(player1: Player, player2: Player, game: Optional[PokerGame] = None, dealer: Optional[int] = None,
+               blinds: Optional[tuple[int, int]] = None, deal: Optional[Deal] = None,
+               all_in_runouts: Optional[int] = None) -> Iterator[Event]:
+    """
+    Simulates a round of poker (one game from Pre-flop to showdown), yielding events as they happen instead of
+    keeping any copies of the game state. Each event is a tuple starting with its event type:
+    - (DEAL_EVENT, dealer, player 1's hand, player 2's hand) once the hands are dealt and the blinds are paid
+    - (ACTION_EVENT, stage, player # - 1, move) after each move has been played
+    - (STAGE_EVENT, stage, community cards) after the game moves on to a new stage
+    - (SHOWDOWN_EVENT, player 1's poker hand, player 2's poker hand) if the round ends in a showdown
+    - (END_EVENT, winner, pool, equity) once the round is over, always the last event, where equity is player 1's
+      expected share of the pool if an all-in was settled by its expected value (see PokerGame.all_in_equity), or None
+
+    The game being played is updated before each event is yielded, so it can be inspected between events.
+
+    Parameters:
+    - player1: player1's equivalent player
+    - player2: player2's equivalent player
+    - game: the game to play the round in; a new game is made if None
+    - dealer: the player # (of player1 and player2) who is the dealer, paying the small blind and getting player 1's
+      hand in the game; picked randomly if None
+    - blinds: the small and big blind; if None, they are 1/200 and 1/100 of the respective player's balance
+    - deal: the dealer and cards of the round (overriding dealer); if None, the cards are random
+    - all_in_runouts: if not None, an all-in is also settled by its expected value over up to this many runouts (see
+      PokerGame.all_in_runouts)
+
+    Preconditions:
+        - player1 and player2 are valid Player objects constructed from the Player parent class in Parameterspy
+        - game is None or game.stage == 0
+        - dealer in {1, 2, None}
+        - blinds is None or 0 <= blinds[0] <= blinds[1]
+    """
+    if game is None:
+        game = PokerGame()
+    if deal is not None:
+        dealer = deal[0]
+        game.load_deck(list(deal[1]))
+    elif dealer is None:
+        dealer = random.randint(1, 2)
+    game.all_in_runouts = all_in_runouts
+    if all_in_runouts is not None:
+        # sampled runouts follow random.seed, and both games of a duplicate deal (which start from the same random
+        # state) sample the same runouts
+        seed_runouts(random.getrandbits(64))
     turn_order = [player1 if dealer == 1 else player2, player2 if dealer == 1 else player1]
     corresponding_hand = [1, 2]
     game.next_stage()
-    p1_initial_cost = int((1 / 200) * turn_order[0].balance)
-    p2_initial_cost = int((1 / 100) * turn_order[1].balance)
+    if blinds is None:
+        p1_initial_cost = int((1 / 200) * turn_order[0].balance)
+        p2_initial_cost = int((1 / 100) * turn_order[1].balance)
+    else:
+        p1_initial_cost, p2_initial_cost = blinds
     game.pool += p1_initial_cost
     game.pool += p2_initial_cost
     turn_order[0].balance -= p1_initial_cost
@@ -49,15 +149,13 @@ def run_round(player1: Player, player2: Player, should_print: bool = True) -> li
     turn_order[1].bet_this_round = p2_initial_cost
     turn_order[1].balance -= p2_initial_cost
     game.last_bet = p2_initial_cost
-    game_states_so_far = [game.copy()]
+    yield (DEAL_EVENT, dealer, tuple(game.player1_hand), tuple(game.player2_hand))
 
     while game.check_winner() is None:
-        # print(f'{game.last_bet} {game.community_cards} {game.stage}')
+        stage = game.stage
+        seat = game.turn
         invested_initially = turn_order[game.turn].bet_this_round
         move = turn_order[game.turn].make_move(game, corresponding_hand[game.turn])
-        if should_print:
-            print(f'[{game.stage}] Player {game.turn + 1} {NUM_TO_ACTION[move[0]]}s'
-                  f'{"" if move[0] not in {RAISE_CODE, BET_CODE}else " "+str(move[1])}')
         game.run_move(move, move[1] - invested_initially if game.stage == 1 else -1)
         if (move[0] == RAISE_CODE or
             (move[0] == BET_CODE and move[1] > 0) or move[0] == ALL_IN_CODE) and \
@@ -71,27 +169,281 @@ def run_round(player1: Player, player2: Player, should_print: bool = True) -> li
             turn_order[0].reset_player()
             turn_order[1].reset_player()
             game.last_bet = 0
-        game_states_so_far.append(game.copy())
+        yield (ACTION_EVENT, stage, seat, move)
+        if game.stage != stage:
+            yield (STAGE_EVENT, game.stage, tuple(game.community_cards))
+
+    if game.player1_poker_hand != '':
+        yield (SHOWDOWN_EVENT, game.player1_poker_hand, game.player2_poker_hand)
+    yield (END_EVENT, game.winner, game.pool, game.equity)
+
+
+def run_rounds(n: int, player1_factory: Callable[[], Player], player2_factory: Callable[[], Player],
+               workers: Optional[int] = None, chunk_size: int = 100, record: bool = True,
+               seed: Optional[int] = None) -> Iterator[list[HandResult]]:
+    """
+    Simulates n rounds of poker across a pool of worker processes, yielding the results in chunks as soon as they are
+    done (chunks may not come back in the order they were started).
+
+    Each worker calls the player factories once when it starts (so players that load large tables, such as a
+    TreePlayer reading its game tree, only do so once per worker) and plays every round with fresh copies of those
+    players.
+
+    Parameters:
+    - n: the number of rounds to simulate
+    - player1_factory: picklable function with no parameters that returns player1's equivalent player
+    - player2_factory: same as player1_factory but for player2
+    - workers: the number of worker processes (defaults to the number of cores); 1 simulates in this process
+    - chunk_size: the number of rounds in each chunk of results
+    - record: if the compact game states of each round should be kept (otherwise they are left empty)
+    - seed: seed for reproducible simulations, where every chunk is seeded from it; chunks are seeded randomly if None
+
+    Preconditions:
+    - n >= 0
+    - workers is None or workers >= 1
+    - chunk_size >= 1
+    """
+    chunks = [(i, min(chunk_size, n - i), None if seed is None else seed + i) for i in range(0, n, chunk_size)]
+    if workers == 1:
+        _init_worker(player1_factory, player2_factory)
+        for chunk in chunks:
+            yield _run_chunk(chunk[1], record, chunk[2])
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                             initargs=(player1_factory, player2_factory)) as executor:
+        # only keep a couple of chunks per worker in flight so millions of rounds don't pile up in memory
+        max_in_flight = 2 * (workers or os.cpu_count() or 1)
+        pending = set()
+        next_chunk = 0
+        while next_chunk < len(chunks) or pending:
+            while next_chunk < len(chunks) and len(pending) < max_in_flight:
+                chunk = chunks[next_chunk]
+                pending.add(executor.submit(_run_chunk, chunk[1], record, chunk[2]))
+                next_chunk += 1
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def _start_worker(player1_factory: Callable[[], Player], player2_factory: Callable[[], Player]) -> None:
+    """
+    Initializer of the worker processes of run_rounds, run_duplicate and iter_duplicate: reseeds the worker (forked
+    workers would otherwise all share the same random state) and creates its player templates.
+    """
+    random.seed()
+    _init_worker(player1_factory, player2_factory)
+
+
+def _init_worker(player1_factory: Callable[[], Player], player2_factory: Callable[[], Player]) -> None:
+    """
+    Creates the player templates used by this process to play rounds. The random state is left alone, so simulating
+    in the calling process keeps the caller's seed.
+
+    Parameters:
+    - player1_factory: function that returns player1's equivalent player
+    - player2_factory: function that returns player2's equivalent player
+    """
+    _worker_players.clear()
+    _worker_players.extend([player1_factory(), player2_factory()])
 
-    # print(f'{game.player1_moves} {game.player2_moves}')
-    # print(game)
 
-    return game_states_so_far
+def _run_chunk(rounds: int, record: bool, seed: Optional[int]) -> list[HandResult]:
+    """
+    Simulates a chunk of rounds with copies of this worker's players, and returns their results.
+
+    Parameters:
+    - rounds: the number of rounds to simulate
+    - record: if the compact game states of each round should be kept
+    - seed: the seed for this chunk, or None to keep the current random state
+
+    Preconditions:
+    - len(_worker_players) == 2
+    """
+    if seed is not None:
+        random.seed(seed)
+    results = []
+    for _ in range(rounds):
+        game = PokerGame()
+        history = []
+        # shallow copies share any large tables (e.g. game trees) with the templates
+        for event in iter_round(copy.copy(_worker_players[0]), copy.copy(_worker_players[1]), game):
+            if record and event[0] in {DEAL_EVENT, ACTION_EVENT}:
+                history.append(game.to_compact())
+        results.append((game.winner, game.pool, game.get_move_sequence(), history))
+    return results
+
+
+def random_deal() -> Deal:
+    """
+    Returns a random deal: a random dealer and the 9 cards dealt in a round (which is all cards a round can use).
+    """
+    return (random.randint(1, 2), tuple(CODE_TO_CARD[code] for code in random.sample(range(52), 9)))
+
+
+def run_duplicate(player1_factory: Callable[[], Player], player2_factory: Callable[[], Player], deals: list[Deal],
+                  workers: Optional[int] = None, chunk_size: int = 50,
+                  all_in_runouts: Optional[int] = None) -> list[tuple[float, float]]:
+    """
+    Plays every deal twice, the second time with the players' seats swapped (so each player gets the cards and position
+    the other player had), and returns player 1's results of each deal averaged over both games, as
+    (score, net currency won), where the score is 1 for a win, 0.5 for a tie and 0 for a loss.
+
+    Both games of a deal use the same cards, including any cards dealt after an all-in, and the same random numbers for
+    the players' decisions, so most of the luck of the cards cancels out between the two games.
+
+    Parameters:
+    - player1_factory: picklable function with no parameters that returns player1's equivalent player
+    - player2_factory: same as player1_factory but for player2
+    - deals: the deals to play
+    - workers: the number of worker processes (defaults to the number of cores); 1 plays in this process
+    - chunk_size: the number of deals sent to a worker at a time
+    - all_in_runouts: if not None, all-ins are settled by their expected value over up to this many runouts, scoring
+      player 1's expected share of the pool instead of a win, tie or loss
+
+    Preconditions:
+    - workers is None or workers >= 1
+    - chunk_size >= 1
+    """
+    chunks = [deals[i:i + chunk_size] for i in range(0, len(deals), chunk_size)]
+    if workers == 1:
+        _init_worker(player1_factory, player2_factory)
+        return [result for chunk in chunks for result in _run_duplicate_chunk(chunk, all_in_runouts)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                             initargs=(player1_factory, player2_factory)) as executor:
+        return [result for chunk_results in executor.map(_run_duplicate_chunk, chunks,
+                                                          itertools.repeat(all_in_runouts))
+                for result in chunk_results]
+
+
+def iter_duplicate(player1_factory: Callable[[], Player], player2_factory: Callable[[], Player],
+                   deals: Iterable[Deal], workers: Optional[int] = None, chunk_size: int = 50,
+                   all_in_runouts: Optional[int] = None) -> Iterator[tuple[int, list[tuple[float, float]]]]:
+    """
+    Same as run_duplicate, but yields the results in chunks as soon as they are done (chunks may not come back in the
+    order they were started), and only takes deals from the iterable as workers need them, so it can be given an
+    endless stream of deals (such as iter(random_deal, None)) and stopped whenever the caller has seen enough.
+
+    Every chunk is yielded as (the index in deals of its first deal, its results), and holds the results of the deals
+    from that index on, in order.
+
+    Preconditions:
+    - workers is None or workers >= 1
+    - chunk_size >= 1
+    """
+    deals = iter(deals)
+    start = 0
+    if workers == 1:
+        _init_worker(player1_factory, player2_factory)
+        chunk = list(itertools.islice(deals, chunk_size))
+        while chunk:
+            yield (start, _run_duplicate_chunk(chunk, all_in_runouts))
+            start += len(chunk)
+            chunk = list(itertools.islice(deals, chunk_size))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                             initargs=(player1_factory, player2_factory)) as executor:
+        max_in_flight = 2 * (workers or os.cpu_count() or 1)
+        pending = {}  # the index of the first deal of every chunk being played, by its future
+        chunk = list(itertools.islice(deals, chunk_size))
+        try:
+            while chunk or pending:
+                while chunk and len(pending) < max_in_flight:
+                    pending[executor.submit(_run_duplicate_chunk, chunk, all_in_runouts)] = start
+                    start += len(chunk)
+                    chunk = list(itertools.islice(deals, chunk_size))
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield (pending.pop(future), future.result())
+        finally:
+            for future in pending:  # the caller stopped early, so don't play chunks that haven't started
+                future.cancel()
+
+
+def summarize_duplicate(results: list[tuple[float, float]]) -> str:
+    """
+    Returns a summary of the results of run_duplicate: player 1's mean score and net currency won per game, each with
+    its 95% confidence interval.
+    """
+    summary = ''
+    for i, name in enumerate(['score', 'currency won']):
+        mean, low, high = mean_interval(sum(result[i] for result in results),
+                                        sum(result[i] ** 2 for result in results), len(results))
+        summary += f'Player 1 {name}: {mean:.4f} [{low:.4f}, {high:.4f}] over {len(results)} duplicate deals\n'
+    return summary
+
+
+def _run_duplicate_chunk(deals: list[Deal], all_in_runouts: Optional[int]) -> list[tuple[float, float]]:
+    """
+    Plays a chunk of deals in duplicate with copies of this worker's players (see run_duplicate).
+
+    Preconditions:
+    - len(_worker_players) == 2
+    """
+    results = []
+    for deal in deals:
+        random_state = random.getstate()
+        first = _play_deal(_worker_players[0], _worker_players[1], deal, all_in_runouts)
+        random.setstate(random_state)  # common random numbers for both games
+        second = _play_deal(_worker_players[1], _worker_players[0], deal, all_in_runouts)
+        results.append(((first[0] + 1 - second[0]) / 2, (first[1] - second[1]) / 2))
+    return results
+
+
+def _play_deal(player1: Player, player2: Player, deal: Deal, all_in_runouts: Optional[int]) -> tuple[float, float]:
+    """
+    Plays a deal with copies of the given players and returns player1's (score, net currency won) in the game, where
+    both are expected values if the game was an all-in settled by its expected value.
+    """
+    player1, player2 = copy.copy(player1), copy.copy(player2)
+    starting_balance = player1.balance
+    winner, pool, equity = 3, 0, None
+    for event in iter_round(player1, player2, deal=deal, all_in_runouts=all_in_runouts):
+        if event[0] == END_EVENT:
+            winner, pool, equity = event[1], event[2], event[3]
+    if equity is not None:
+        # equity is the share of whoever sat in player 1's seat, which the dealer gets
+        share = equity if deal[0] == 1 else 1 - equity
+        return (share, share * pool - (starting_balance - player1.balance))
+    if winner == 3:  # any odd chip goes to the dealer
+        share = pool - pool // 2 if deal[0] == 1 else pool // 2
+        return (0.5, share - (starting_balance - player1.balance))
+    # the dealer gets player 1's seat in the game
+    player1_won = (winner == 1) == (deal[0] == 1)
+    return (1.0 if player1_won else 0.0, (pool if player1_won else 0) - (starting_balance - player1.balance))
+
+
+def expand_history(move_sequence: list[Move], history: list[CompactState]) -> list[PokerGame]:
+    """
+    Returns the game states of a round from the compact game states returned by run_rounds.
+
+    Parameters:
+    - move_sequence: the move sequence of the round
+    - history: the compact game states of the round
+
+    Preconditions:
+    - history was recorded by run_rounds with move_sequence as its move sequence
+    """
+    return [PokerGame.from_compact(state, move_sequence[:i]) for i, state in enumerate(history)]
 
 
 if __name__ == '__main__':
+    import python_ta
     games = 200
     for i in range(games):
         p1 = TestingPlayer(10000)
         p2 = NaivePlayer(10000)
-        result = run_round(p1, p2, False)[-1]
+        result = run_round(p1, p2, False, record=False)[-1]
         print(f'Player {result.winner} has won the game and {result.pool} currency!')
         print(result)
 
-python_ta.check_all(config={
-    'max-line-length': 120,
-    'extra-imports': ['pygame', 'random', 'pygame.gfxdraw', 'player', 'poker_game', 'NaivePlayer', 'time'],
-    'allowed-io': ['make_move', 'HumanPlayer', 'run_round2'],
-    'generated-members': ['pygame.*'],
-    'disable': ['E9997', 'E9992']
-})
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ['pygame', 'random', 'pygame.gfxdraw', 'player', 'poker_game', 'NaivePlayer', 'time',
+                          'concurrent.futures', 'copy', 'itertools', 'os', 'poker_statistics',
+                          'hand_history'],
+        'allowed-io': ['make_move', 'HumanPlayer', 'run_round2'],
+        'generated-members': ['pygame.*'],
+        'disable': ['E9997', 'E9992']
+    })
@@ -7,12 +7,12 @@ It is based on the tree ADT.
 This file is Copyright (c) 2023 Francis Madarang, Sungjin Hong, Sean Kwee, Yenah Lee
 """
 from __future__ import annotations
-from typing import Any, Optional
+from collections import Counter
+from typing import Any, Iterable, Iterator, Optional, Sequence
 from poker_game import Card, Move, PokerGame, NUM_TO_POKER_HAND, NUM_TO_RANK
 from game_runner import NUM_TO_ACTION, run_round
 from player import Player, TestingPlayer, NaivePlayer
 import copy
-import python_ta
 
 # Static variables for what specific integers mean in the context of moves
 FOLD_CODE = 0
@@ -28,6 +28,80 @@ THREAT_CONSTANT = 6
 
 burner_player = Player(10)  # player object to access player methods
 
+# The vocabulary of classes of action. In a game tree, a set of classes of action is stored as an int with bit i set
+# for every class of action TAGS[i] in the set; the names are only used to display a tree and in game tree files.
+# Player actions come first, so they are the first names of a set (see tag_names).
+BET_ADJECTIVES = ['Conservative', 'Moderate', 'Aggressive', 'Very Aggressive']
+TAGS = list(NUM_TO_ACTION.values()) + \
+    [f'{adjective} {NUM_TO_ACTION[code]}' for code in (BET_CODE, RAISE_CODE) for adjective in BET_ADJECTIVES] + \
+    ['BTN Hand', 'Non BTN Hand'] + \
+    [f'High Card {NUM_TO_RANK[rank]} in hand' for rank in range(1, 14)] + ['High Card not in hand'] + \
+    [f'{NUM_TO_POKER_HAND[i]} {suffix}' for suffix in ('in hand', 'if lucky', 'is threat')
+     for i in range(1, 11) if (i, suffix) != (10, 'in hand')]
+TAG_IDS = {tag: i for i, tag in enumerate(TAGS)}
+
+# bits of the set of classes of action that name a player action
+ACTION_TAGS = sum(1 << TAG_IDS[tag] for tag in TAGS if any(action in tag for action in NUM_TO_ACTION.values()))
+
+# bits of the classes of action added by get_classes_of_action, looked up instead of formatting their names
+_MOVE_BITS = {code: 1 << TAG_IDS[NUM_TO_ACTION[code]] for code in NUM_TO_ACTION}
+_SIZED_MOVE_BITS = {(adjective, code): 1 << TAG_IDS[f'{adjective} {NUM_TO_ACTION[code]}']
+                    for code in (BET_CODE, RAISE_CODE) for adjective in BET_ADJECTIVES}
+_HIGH_CARD_BITS = {rank: 1 << TAG_IDS[f'High Card {NUM_TO_RANK[rank]} in hand'] for rank in range(1, 14)}
+_HIGH_CARD_BITS[None] = 1 << TAG_IDS['High Card not in hand']
+_IN_HAND_BITS = {i: 1 << TAG_IDS[f'{NUM_TO_POKER_HAND[i]} in hand'] for i in range(1, 10)}
+_LUCKY_BITS = {i: 1 << TAG_IDS[f'{NUM_TO_POKER_HAND[i]} if lucky'] for i in range(1, 11)}
+_THREAT_BITS = {i: 1 << TAG_IDS[f'{NUM_TO_POKER_HAND[i]} is threat'] for i in range(1, 11)}
+
+
+def tag_names(classes_of_action: int) -> list[str]:
+    """
+    Returns the names of the classes of action in a set of classes of action, in the order of TAGS.
+    """
+    names = []
+    i = 0
+    while classes_of_action:
+        if classes_of_action & 1:
+            names.append(TAGS[i])
+        classes_of_action >>= 1
+        i += 1
+    return names
+
+
+def tags_to_classes(names: Iterable[str]) -> int:
+    """
+    Returns the set of classes of action with the given names.
+
+    Preconditions:
+    - all(name in TAG_IDS for name in names)
+    """
+    classes_of_action = 0
+    for name in names:
+        if name not in TAG_IDS:
+            raise ValueError(f'unknown class of action: {name!r}')
+        classes_of_action |= 1 << TAG_IDS[name]
+    return classes_of_action
+
+
+def parse_classes(text: str) -> int:
+    """
+    Returns the set of classes of action written by classes_to_string.
+    """
+    if text == 'set()':
+        return 0
+    names = text[1:-1].split(',')
+    for i in range(len(names)):
+        names[i] = names[i].strip()[1:-1]
+    return tags_to_classes(names)
+
+
+def classes_to_string(classes_of_action: int) -> str:
+    """
+    Returns a set of classes of action written like a Python set of their names, as in game tree files.
+    """
+    names = tag_names(classes_of_action)
+    return '{' + ', '.join(repr(name) for name in names) + '}' if names else 'set()'
+
 
 class GameTree:
     """
@@ -35,10 +109,17 @@ class GameTree:
     Each root/node represents a class of action; a way of categorizing the situation/board state in which players made
     their decisions and their responses to the situation.
 
+    Nodes are stored compactly, since trained trees have tens of millions of them: each node has a fixed set of slots
+    instead of a dictionary of attributes, the class of action a node is stored under in its parent's subtrees is the
+    same int object as the node's classes_of_action, and the confidence value is computed from the game counts when it
+    is read instead of being stored.
+
     Instance Attributes:
-    - classes_of_actions: the set of classes of actions
+    - classes_of_actions: the set of classes of actions, as an int with the bit of every class of action in the set
+      (see TAGS); None for the root
     - subtrees: a dictionary** representing the subtrees for recurssive search
-    - move_condience_value: the "confidence" of winning of this tree path.
+    - move_confidence_value: the "confidence" of winning of this tree path (read-only; good outcomes over total games,
+      or 0.0 if no games followed the path)
     - good_outcomes_in_route: good outcomes in route.
     - total_games_in_route: the amount of games in the route.
 
@@ -50,19 +131,19 @@ class GameTree:
     - 0.0 <= self.move_confidence_value <= 1.0
     - self.total_games_in_route >= self.good_outcomes_in_route
     """
-    classes_of_action: Optional[set[str]]
-    subtrees: dict[frozenset[str], GameTree]
-    move_confidence_value: float
+    classes_of_action: Optional[int]
+    subtrees: dict[int, GameTree]
     good_outcomes_in_route: int
     total_games_in_route: int
 
-    def __init__(self, node_val: Optional[set[str]] = None) -> None:
+    __slots__ = ('classes_of_action', 'subtrees', 'good_outcomes_in_route', 'total_games_in_route')
+
+    def __init__(self, node_val: Optional[int] = None) -> None:
         """
         Initializer for a sequence of game situations or moves in poker.
         """
         self.classes_of_action = node_val
         self.subtrees = {}
-        self.move_confidence_value = 0
         self.total_games_in_route = 0
         self.good_outcomes_in_route = 0
 
@@ -71,7 +152,7 @@ class GameTree:
         """
         Inserts a sequence of moves into the tree. Will insert the move at move_number into a new subtree or current
         subtree of appropriate height (i.e. if move_number is 0, the move will go into a subtree of height 1, as that is
-        the first move played in the game).
+        the first move played in the game). Returns whether the sequence of moves had a good outcome.
 
         Classes of action are based on the player we are 'following' (i.e. player whose information we share)
         NOTE: Classes of action are just a fancy name for tags that accurately describe the situation or event being
@@ -89,90 +170,194 @@ class GameTree:
         - 0 <= move_number < len(moves)
         - following in {0, 1}
         """
-        if move_number == len(moves):  # last move was the last move
-            current_state = game_states[-1]
-            my_hand = current_state.player1_hand if following == 0 else current_state.player2_hand
-            opponent_hand = current_state.player2_hand if following == 0 else current_state.player1_hand
-            if current_state.stage == 1 or current_state.community_cards == set():  # only folds can trigger this
-                self.total_games_in_route += 1
-                my_hand_good = burner_player.rate_hand(list(my_hand))
-                opponent_hand_good = burner_player.rate_hand(list(opponent_hand))
-                # getting opponent to fold when they have a theoretically better hand is always good
-                if opponent_hand_good == 1 and my_hand_good == 2:
-                    self.good_outcomes_in_route += 1
-                    self._update_confidence_value()
-                    return True
-            elif current_state.stage == 4:  # only folds can trigger this
-                self.total_games_in_route += 1
-                p1_score = current_state.rank_poker_hand(my_hand)
-                p2_score = current_state.rank_poker_hand(opponent_hand)
-                if current_state.determine_winner(p1_score, p2_score) == 2:
-                    # folding in a disadvantageous position is generally good and getting an opponent who has an
-                    #  advantage to fold is a good outcome as well
-                    self.good_outcomes_in_route += 1
-                    self._update_confidence_value()
-                    return True
-            elif current_state.stage == 5:  # only showdowns can trigger this
-                self.total_games_in_route += 1
-                # won and made decent money
-                if current_state.winner == following + 1 and any(move[0] in
-                                                                 {RAISE_CODE, CALL_CODE, BET_CODE} for move in moves):
-                    self.good_outcomes_in_route += 1
-                    self._update_confidence_value()
-                    return True
-            else:  # only folds can trigger
-                self.total_games_in_route += 1
-                used_cards = current_state.community_cards.union(my_hand.union(opponent_hand))
-                next_comm_cards = self._generate_card_combos(used_cards, set(), 4 - len(current_state.community_cards))
-                positive_outcomes = 0
-                for next_cards in next_comm_cards:
-                    p1_score = current_state.rank_poker_hand(my_hand.union(next_cards))
-                    p2_score = current_state.rank_poker_hand(opponent_hand.union(next_cards))
-                    if current_state.determine_winner(p1_score, p2_score) == 1:
-                        positive_outcomes += 1
-                if positive_outcomes < len(next_comm_cards) / 2:
-                    # folding in a disadvantageous position is generally good and getting an opponent who has an
-                    # advantage to fold is a good outcome as well
-                    self.good_outcomes_in_route += 1
-                    self._update_confidence_value()
-                    return True
-            self._update_confidence_value()
-            return False
-        else:
+        path, good_outcome = self.tag_moves(moves, game_states, following, evaluated, move_number)
+        self.insert_path(path, good_outcome)
+        return good_outcome
+
+    def tag_moves(self, moves: list[Move], game_states: list[PokerGame], following: int, evaluated: bool = False,
+                  move_number: int = 0) -> tuple[list[int], bool]:
+        """
+        Returns the path of classes of action that insert_moves would insert the sequence of moves along, and whether
+        the sequence had a good outcome. This is the expensive part of inserting moves (it enumerates the cards that
+        could come), and it does not depend on the contents of the tree, so it can be done in other processes and the
+        result inserted later with insert_path.
+
+        Parameters:
+        - moves: the list of moves
+        - game_states: the list of game_states corresponding to said moves.
+        - following: the player we are following
+        - evaluated: has the move on this round been evaluated
+        - move_number: the current move number we are on.
+
+        Preconditions:
+        - len(moves) == len(game_states)
+        - 0 <= move_number < len(moves)
+        - following in {0, 1}
+        """
+        path = []
+        while move_number != len(moves):
             current_move = moves[move_number]
             current_state = game_states[move_number]
             classes_of_action = self.get_classes_of_action(current_move, current_state, following, evaluated)
-            if not any(any(action in c for c in classes_of_action) for action in list(NUM_TO_ACTION.values())):
+            has_action = classes_of_action & ACTION_TAGS != 0
+            if not has_action:
                 # an evaluation occurs if and only if there were no player actions in the classes of action
                 evaluated = True
-            immutable_actions = frozenset(classes_of_action)
-            # add a new subtree for class of action if it doesn't already exist
-            if immutable_actions not in self.subtrees:
-                self.add_subtree(immutable_actions)
+            path.append(classes_of_action)
             if move_number + 1 != len(moves):  # checks to see if the next game_state has changed rounds
                 if current_state.stage != game_states[move_number + 1].stage:
                     evaluated = False
-            self.total_games_in_route += 1
-            # if positive outcome in lower branch
-            if self.subtrees[immutable_actions].insert_moves(
-                    moves, game_states, following, evaluated,
-                    move_number + (1 if any(any(action in c for c in classes_of_action)
-                                            for action in list(NUM_TO_ACTION.values())) else 0)):
-                self.good_outcomes_in_route += 1
-                self._update_confidence_value()
-                return True
+            if has_action:
+                move_number += 1
+        return (path, self._is_good_outcome(moves, game_states, following))
+
+    def insert_path(self, path: Sequence[int], good_outcome: bool, count: int = 1) -> None:
+        """
+        Inserts a path of classes of action (as returned by tag_moves) into the tree, counting count games along the
+        path, all of which had a good outcome if good_outcome is True.
+
+        Parameters:
+        - path: the classes of action of each node along the path, starting from the child of this node
+        - good_outcome: whether the games had a good outcome
+        - count: the number of games following the path
+
+        Preconditions:
+        - count >= 1
+        """
+        tree = self
+        for classes_of_action in path:
+            tree.total_games_in_route += count
+            if good_outcome:
+                tree.good_outcomes_in_route += count
+            if classes_of_action not in tree.subtrees:
+                tree.add_subtree(classes_of_action)
+            tree = tree.subtrees[classes_of_action]
+        tree.total_games_in_route += count
+        if good_outcome:
+            tree.good_outcomes_in_route += count
+
+    def merge(self, other: GameTree) -> None:
+        """
+        Adds the games of another tree to this tree, as if every game inserted into other had also been inserted into
+        this tree: the game counts of matching paths are summed, and paths only in other are added.
+
+        Parameters:
+        - other: the tree to merge into this tree
 
-            self._update_confidence_value()
-            return False
+        Preconditions:
+        - self.classes_of_action == other.classes_of_action
+        """
+        self.total_games_in_route += other.total_games_in_route
+        self.good_outcomes_in_route += other.good_outcomes_in_route
+        for classes_of_action, subtree in other.subtrees.items():
+            if classes_of_action not in self.subtrees:
+                self.add_subtree(classes_of_action)
+            self.subtrees[classes_of_action].merge(subtree)
+
+    def ending_paths(self) -> Iterator[tuple[tuple[int, ...], int, int]]:
+        """
+        Yields (path, good outcomes, total games) for the games whose paths end at each node of this tree, with paths
+        as in insert_path, so inserting them into a tree adds the games of this tree to it.
+        """
+        stack = [((), self)]
+        while stack:
+            path, tree = stack.pop()
+            good = tree.good_outcomes_in_route - sum(s.good_outcomes_in_route for s in tree.subtrees.values())
+            total = tree.total_games_in_route - sum(s.total_games_in_route for s in tree.subtrees.values())
+            if total > 0:
+                yield (path, good, total)
+            for classes_of_action in reversed(tree.subtrees):
+                stack.append((path + (classes_of_action,), tree.subtrees[classes_of_action]))
+
+    def insert_paths(self, tagged_paths: Iterable[tuple[Sequence[int], bool]]) -> None:
+        """
+        Inserts many paths of classes of action (as returned by tag_moves) into the tree. Identical paths with the
+        same outcome are counted together first, so the tree is walked once per distinct path; the resulting tree is
+        the same as inserting the paths one at a time.
 
-    def _update_confidence_value(self) -> None:
+        Parameters:
+        - tagged_paths: (path, whether its game had a good outcome) for every game
         """
-        Update the confidence value of the current node (represented by self).
+        counts = Counter((tuple(path), good_outcome) for path, good_outcome in tagged_paths)
+        for (path, good_outcome), count in counts.items():
+            self.insert_path(path, good_outcome, count)
+
+    def _is_good_outcome(self, moves: list[Move], game_states: list[PokerGame], following: int) -> bool:
         """
-        self.move_confidence_value = self.good_outcomes_in_route / self.total_games_in_route
+        Returns whether a finished sequence of moves had a good outcome for the player we are following.
+
+        Parameters:
+        - moves: the list of moves
+        - game_states: the list of game_states corresponding to said moves.
+        - following: the player we are following
+
+        Preconditions:
+        - len(moves) == len(game_states)
+        - following in {0, 1}
+        """
+        current_state = game_states[-1]
+        my_hand = current_state.player1_hand if following == 0 else current_state.player2_hand
+        opponent_hand = current_state.player2_hand if following == 0 else current_state.player1_hand
+        if current_state.stage == 1 or current_state.community_cards == set():  # only folds can trigger this
+            my_hand_good = burner_player.rate_hand(list(my_hand))
+            opponent_hand_good = burner_player.rate_hand(list(opponent_hand))
+            # getting opponent to fold when they have a theoretically better hand is always good
+            return opponent_hand_good == 1 and my_hand_good == 2
+        elif current_state.stage == 4:  # only folds can trigger this
+            p1_score = current_state.rank_poker_hand(my_hand)
+            p2_score = current_state.rank_poker_hand(opponent_hand)
+            # folding in a disadvantageous position is generally good and getting an opponent who has an
+            #  advantage to fold is a good outcome as well
+            return current_state.determine_winner(p1_score, p2_score) == 2
+        elif current_state.stage == 5:  # only showdowns can trigger this
+            if current_state.equity is not None:  # an all-in settled by its expected value
+                won = (current_state.equity if following == 0 else 1 - current_state.equity) > 0.5
+            else:
+                won = current_state.winner == following + 1
+            # won and made decent money
+            return won and any(move[0] in {RAISE_CODE, CALL_CODE, BET_CODE} for move in moves)
+        else:  # only folds can trigger
+            used_cards = current_state.community_cards.union(my_hand.union(opponent_hand))
+            next_comm_cards = self._generate_card_combos(used_cards, set(), 4 - len(current_state.community_cards))
+            positive_outcomes = 0
+            for next_cards in next_comm_cards:
+                p1_score = current_state.rank_poker_hand(my_hand.union(next_cards))
+                p2_score = current_state.rank_poker_hand(opponent_hand.union(next_cards))
+                if current_state.determine_winner(p1_score, p2_score) == 1:
+                    positive_outcomes += 1
+            # folding in a disadvantageous position is generally good and getting an opponent who has an
+            # advantage to fold is a good outcome as well
+            return positive_outcomes < len(next_comm_cards) / 2
+
+    @property
+    def move_confidence_value(self) -> float:
+        """
+        The confidence value of the current node (represented by self): the fraction of the games following its path
+        that had a good outcome.
+        """
+        if self.total_games_in_route == 0:
+            return 0.0
+        return self.good_outcomes_in_route / self.total_games_in_route
+
+    def find_subtree(self, classes_of_action: int) -> Optional[GameTree]:
+        """
+        Returns the subtree of this tree for the given classes of action, or None if this tree has not encountered them.
+        """
+        return self.subtrees.get(classes_of_action)
+
+    def best_subtree(self) -> Optional[GameTree]:
+        """
+        Returns the subtree with the highest confidence value (the first one added if several are tied), or None if this
+        tree has no subtrees.
+        """
+        best_so_far = None
+        for subtree in self.subtrees.values():
+            if best_so_far is None or best_so_far.move_confidence_value < subtree.move_confidence_value:
+                best_so_far = subtree
+        return best_so_far
 
     def get_classes_of_action(self, move: Move, game_state: PokerGame, following: int, evaluated: bool,
-                              evaluate_move: bool = True) -> set[str]:
+                              evaluate_move: bool = True) -> int:
         """
         Returns 'tags' or what we call 'classes of action' characteristic of the given input board_state and
         corresponding move played.
@@ -193,7 +378,7 @@ class GameTree:
         Preconditions:
         - following in {1, 2}
         """
-        classes_so_far = set()
+        classes_so_far = 0
         # determine whose hand we can see
         if following == 0:
             player_hand = game_state.player1_hand
@@ -205,9 +390,9 @@ class GameTree:
             hand_to_check.sort()
             hand_quality = burner_player.rate_hand(hand_to_check)
             if hand_quality == 1:
-                classes_so_far.add('BTN Hand')
+                classes_so_far |= 1 << TAG_IDS['BTN Hand']
             else:
-                classes_so_far.add('Non BTN Hand')
+                classes_so_far |= 1 << TAG_IDS['Non BTN Hand']
             return classes_so_far
         if game_state.stage != 1 and not evaluated:
             current_best = game_state.rank_poker_hand(player_hand)
@@ -216,10 +401,9 @@ class GameTree:
             if 'High Card' == NUM_TO_POKER_HAND[current_best[0]]:
                 best = [card for card in current_best[1] if card not in game_state.community_cards]
                 best = best[0] if best != [] else -1
-                classes_so_far.add(
-                    f'High Card {NUM_TO_RANK[(best[0] - 1) % 13 + 1 ] if isinstance(best, tuple) else "not"} in hand')
+                classes_so_far |= _HIGH_CARD_BITS[(best[0] - 1) % 13 + 1 if isinstance(best, tuple) else None]
             else:
-                classes_so_far.add(f'{NUM_TO_POKER_HAND[current_best[0]]} in hand')
+                classes_so_far |= _IN_HAND_BITS[current_best[0]]
             # potential poker hands the player can make in later in the game (if lucky)
             if game_state.stage != 4:
                 possible_adds_comm_cards = self._generate_card_combos(used_cards, set(),
@@ -237,20 +421,18 @@ class GameTree:
                 while i < len(hands) and hands[i] <= len(possible_adds_comm_cards) / THREAT_CONSTANT:
                     i += 1
                 if i < len(hands):
-                    classes_so_far.add(f'{NUM_TO_POKER_HAND[i]} if lucky')
+                    classes_so_far |= _LUCKY_BITS[i]
         if game_state.stage != 1 and following != game_state.turn:
             current_best = game_state.rank_poker_hand(player_hand)
             used_cards = game_state.community_cards.union(player_hand)
-            class_to_add = self._determine_threats(game_state, used_cards, current_best)
-            if class_to_add is not None:
-                classes_so_far.add(class_to_add)
+            classes_so_far |= self._determine_threats(game_state, used_cards, current_best)
         if not evaluated:
             return classes_so_far
         # Add type of move that was played
         if following != game_state.turn or evaluated:  # acts normally for the opponent
             if evaluate_move:
                 if move[0] not in {BET_CODE, RAISE_CODE}:
-                    classes_so_far.add(f'{NUM_TO_ACTION[move[0]]}')
+                    classes_so_far |= _MOVE_BITS[move[0]]
                 else:
                     if game_state.pool >= move[1]:  # bet is about the pot size
                         adjective = 'Conservative'
@@ -260,11 +442,11 @@ class GameTree:
                         adjective = 'Aggressive'  # bet is otherwise very high
                     else:
                         adjective = 'Very Aggressive'
-                    classes_so_far.add(f'{adjective} {NUM_TO_ACTION[move[0]]}')
+                    classes_so_far |= _SIZED_MOVE_BITS[(adjective, move[0])]
 
         return classes_so_far
 
-    def add_subtree(self, classes_of_action: frozenset[str]) -> None:
+    def add_subtree(self, classes_of_action: int) -> None:
         """
         Adds a new subtree to the tree's list of subtrees
 
@@ -274,13 +456,13 @@ class GameTree:
         Preconditions:
         - classes_of_action not in self.subtrees
         """
-        self.subtrees[classes_of_action] = GameTree(set(classes_of_action))
+        self.subtrees[classes_of_action] = GameTree(classes_of_action)
 
     def _determine_threats(self, game_state: PokerGame, used_cards: set[Card],
-                           current_best: tuple[Any, ...]) -> Optional[str]:
+                           current_best: tuple[Any, ...]) -> int:
         """
         Determine what kind of poker hand is likely enough to come out for the opponent to be legitimately considered a
-        threat.
+        threat, returned as the bit of its class of action (0 if there is none).
 
         Parameters:
         - game_state: current game state
@@ -308,9 +490,9 @@ class GameTree:
             # take the highest poker hand that poses a 'legitimate risk' ie. >=16.7% of the opponent having it or better
             i += 1
         if i < len(better_hands):
-            return f'{NUM_TO_POKER_HAND[i]} is threat'
+            return _THREAT_BITS[i]
         else:
-            return None
+            return 0
 
     def _generate_card_combos(self, used_cards: set[Card], cards_so_far: set[Card],
                               level_to_stop: int) -> list[set[Card]]:
@@ -354,23 +536,61 @@ class GameTree:
             return
         else:
             curr_stats = moves[current].split(';')
-            self.move_confidence_value = float(curr_stats[1])
+            # the confidence value in curr_stats[1] is derived from the game counts, so it is not read
             self.good_outcomes_in_route = int(curr_stats[2])
             self.total_games_in_route = int(curr_stats[3])
             if current + 1 != len(moves):
-                next_subtree = moves[current + 1].split(';')[0][1:-1].split(',')
-                for i in range(len(next_subtree)):
-                    next_subtree[i] = next_subtree[i].strip()[1:-1]
-                frozenset_of_action = frozenset(next_subtree)
-                if frozenset_of_action not in self.subtrees:
-                    self.add_subtree(frozenset_of_action)
-                self.subtrees[frozenset_of_action].insert_row_moves(moves, current + 1)
+                classes_of_action = parse_classes(moves[current + 1].split(';')[0])
+                if classes_of_action not in self.subtrees:
+                    self.add_subtree(classes_of_action)
+                self.subtrees[classes_of_action].insert_row_moves(moves, current + 1)
+
+    def insert_rows(self, rows: Iterable[str]) -> None:
+        """
+        Inserts rows of a file written by tree_player.print_to_file into the tree, as insert_row_moves would for each
+        row split on '$', but in time linear in the length of the rows. Consecutive rows of such a file share the path
+        to their common ancestor, so the nodes of the longest prefix a row shares with the previous row are neither
+        looked up nor updated again, and each distinct set of classes of action is only parsed once.
+
+        Parameters:
+        - rows: the rows, such as the lines of the file
+
+        Preconditions:
+        - every row represents a sequence of nodes to be inserted, delimited by '$', starting from this node
+        """
+        parsed_classes = {}
+        previous = []
+        # the node reached after each node of the previous row
+        path = []
+        for row in rows:
+            nodes = row.rstrip('\n').split('$')
+            shared = 0
+            while shared < len(nodes) and shared < len(previous) and nodes[shared] == previous[shared]:
+                shared += 1
+            del path[shared:]
+            for node in nodes[shared:]:
+                classes, _, good, total = node.rsplit(';', 3)
+                if not path:
+                    tree = self
+                else:
+                    if classes not in parsed_classes:
+                        parsed_classes[classes] = parse_classes(classes)
+                    classes_of_action = parsed_classes[classes]
+                    parent = path[-1]
+                    if classes_of_action not in parent.subtrees:
+                        parent.add_subtree(classes_of_action)
+                    tree = parent.subtrees[classes_of_action]
+                tree.good_outcomes_in_route = int(good)
+                tree.total_games_in_route = int(total)
+                path.append(tree)
+            previous = nodes
 
     def __str__(self) -> str:
         """
         Turns relevant information from a node into a string delimited by semicolons
         """
-        str_so_far = f'{self.classes_of_action};{self.move_confidence_value};'
+        classes = 'None' if self.classes_of_action is None else classes_to_string(self.classes_of_action)
+        str_so_far = f'{classes};{self.move_confidence_value};'
         str_so_far += f'{self.good_outcomes_in_route};{self.total_games_in_route}'
         return str_so_far
 
@@ -387,15 +607,17 @@ if __name__ == '__main__':
         tree.insert_moves(move_sequence, result, 1)
     tree_copy = copy.copy(tree)
     while len(tree.subtrees) > 0:
-        print(tree.classes_of_action)
+        print(tag_names(tree.classes_of_action or 0))
         subtrees = list(tree.subtrees.keys())
         tree = tree.subtrees[subtrees[0]]
-    print(tree.classes_of_action)
-
-python_ta.check_all(config={
-    'max-line-length': 120,
-    'extra-imports': ['pygame', 'random', 'pygame.gfxdraw', 'player', 'poker_game', 'NaivePlayer', 'time'],
-    'allowed-io': ['make_move', 'HumanPlayer', 'run_round2'],
-    'generated-members': ['pygame.*'],
-    'disable': ['E9997', 'E9992']
-})
+    print(tag_names(tree.classes_of_action or 0))
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'extra-imports': ['pygame', 'random', 'pygame.gfxdraw', 'player', 'poker_game', 'NaivePlayer', 'time',
+                          'collections', 'typing'],
+        'allowed-io': ['make_move', 'HumanPlayer', 'run_round2'],
+        'generated-members': ['pygame.*'],
+        'disable': ['E9997', 'E9992']
+    })
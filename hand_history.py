@@ -0,0 +1,164 @@
+"""
+DeepPoker Project
+
+This module contains a compact binary format for the history of played rounds, so rounds can be simulated in one
+process (or on one machine) and learned from in another, and millions of rounds can be replayed into new game trees.
+
+A hand history file is a sequence of records, each made of its length in bytes (4 byte little endian int) and then:
+- the number of moves, followed by each move as its code (1 byte) and amount (4 byte signed int)
+- the number of game states, followed by each compact game state (see PokerGame.to_compact) as its stage, turn and
+  winner (1 byte each), pool and last bet (4 byte signed ints each), and the card codes of player 1's hand, player 2's
+  hand and the community cards, each preceded by how many there are (1 byte)
+
+This file is Copyright (c) 2023 Francis Madarang, Sungjin Hong, Sean Kwee, Yenah Lee
+"""
+from __future__ import annotations
+from typing import BinaryIO, Iterator
+import struct
+from poker_game import Move, CompactState
+
+LENGTH = struct.Struct('<I')
+COUNT = struct.Struct('<H')
+MOVE = struct.Struct('<Bi')
+STATE = struct.Struct('<BBBii')
+
+
+class HandHistoryWriter:
+    """
+    A buffered writer of rounds to a hand history file. Records are collected in memory and written in large blocks,
+    so writing a round costs about as much as encoding it.
+
+    Instance Attributes:
+    - file: the name of the hand history file
+    - buffer_size: the number of bytes collected before they are written to the file
+    - rounds_written: the number of rounds written so far
+
+    Representation Invariants:
+    - self.buffer_size >= 0
+    - self.rounds_written >= 0
+    """
+    file: str
+    buffer_size: int
+    rounds_written: int
+    _buffer: bytearray
+    _writer: BinaryIO
+
+    def __init__(self, file: str, append: bool = False, buffer_size: int = 1 << 20) -> None:
+        """
+        Initializer for a writer to the given file, which is overridden unless append is True.
+
+        Preconditions:
+        - buffer_size >= 0
+        """
+        self.file = file
+        self.buffer_size = buffer_size
+        self.rounds_written = 0
+        self._buffer = bytearray()
+        self._writer = open(file, 'ab' if append else 'wb')
+
+    def __enter__(self) -> HandHistoryWriter:
+        """
+        Returns the writer, so it can be used in a with statement that closes it.
+        """
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """
+        Closes the writer at the end of a with statement.
+        """
+        self.close()
+
+    def write(self, move_sequence: list[Move], states: list[CompactState]) -> None:
+        """
+        Adds a round to the hand history.
+
+        Parameters:
+        - move_sequence: the move sequence of the round
+        - states: the compact game states of the round, such as those recorded by game_runner.run_rounds
+
+        Preconditions:
+        - len(move_sequence) < 2 ** 16 and len(states) < 2 ** 16
+        """
+        record = bytearray(COUNT.pack(len(move_sequence)))
+        for move in move_sequence:
+            record += MOVE.pack(move[0], move[1])
+        record += COUNT.pack(len(states))
+        for stage, pool, last_bet, turn, winner, hand1, hand2, community_cards in states:
+            record += STATE.pack(stage, turn, winner, pool, last_bet)
+            for cards in (hand1, hand2, community_cards):
+                record.append(len(cards))
+                record += bytes(cards)
+        self._buffer += LENGTH.pack(len(record))
+        self._buffer += record
+        self.rounds_written += 1
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes every round collected so far to the file.
+        """
+        self._writer.write(self._buffer)
+        self._writer.flush()
+        self._buffer.clear()
+
+    def close(self) -> None:
+        """
+        Writes every round collected so far and closes the file.
+        """
+        if not self._writer.closed:
+            self.flush()
+            self._writer.close()
+
+
+def read_hand_history(file: str) -> Iterator[tuple[list[Move], list[CompactState]]]:
+    """
+    Yields the (move sequence, compact game states) of every round in a hand history file, reading only one round at a
+    time. The game states can be turned back into PokerGames with game_runner.expand_history.
+
+    Parameters:
+    - file: the name of the hand history file
+
+    Preconditions:
+    - file was written by a HandHistoryWriter
+    """
+    with open(file, 'rb') as reader:
+        while True:
+            length_bytes = reader.read(LENGTH.size)
+            if len(length_bytes) < LENGTH.size:
+                return
+            record = reader.read(LENGTH.unpack(length_bytes)[0])
+            yield _decode_record(record)
+
+
+def _decode_record(record: bytes) -> tuple[list[Move], list[CompactState]]:
+    """
+    Returns the (move sequence, compact game states) encoded in a record of a hand history file.
+    """
+    num_moves = COUNT.unpack_from(record, 0)[0]
+    offset = COUNT.size
+    move_sequence = list(MOVE.iter_unpack(record[offset:offset + num_moves * MOVE.size]))
+    offset += num_moves * MOVE.size
+    num_states = COUNT.unpack_from(record, offset)[0]
+    offset += COUNT.size
+    states = []
+    for _ in range(num_states):
+        stage, turn, winner, pool, last_bet = STATE.unpack_from(record, offset)
+        offset += STATE.size
+        card_lists = []
+        for _ in range(3):
+            count = record[offset]
+            card_lists.append(tuple(record[offset + 1:offset + 1 + count]))
+            offset += 1 + count
+        states.append((stage, pool, last_bet, turn, winner, card_lists[0], card_lists[1], card_lists[2]))
+    return (move_sequence, states)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'typing', 'struct', 'poker_game'],
+        'allowed-io': ['HandHistoryWriter.__init__', 'read_hand_history'],
+        'max-line-length': 120,
+        'disable': ['R1732']  # the writer keeps its file open until it is closed
+    })
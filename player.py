@@ -101,6 +101,12 @@ class Player:
         self.has_raised = False
         self.has_folded = False
 
+    def reset_hand(self) -> None:
+        """
+        Resets the player so it can play a new round (used when the same player plays many rounds in a row)
+        """
+        self.reset_player()
+
     def win_probability(self, game_state: PokerGame, player_num: int) -> float:
         """
         Returns the win probability
@@ -373,9 +379,8 @@ class ConservativePlayer(Player):
                 bet_amount = int(self.bet_size(game_state, win_prob) * 0.25)
                 self.move_bet(bet_amount)
                 return (3, bet_amount)
-        else:
-            self.move_fold()
-            return (0, 0)
+        self.move_fold()
+        return (0, 0)
 
     def bet_size(self, game_state: PokerGame, win_prob_threshold: float) -> float:
         """
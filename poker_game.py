@@ -8,12 +8,15 @@ determine what two poker hands are stronger given some information about the pok
 This file is Copyright (c) 2023 Francis Madarang, Sungjin Hong, Sean Kwee, Yenah Lee
 """
 from __future__ import annotations
+import itertools
+import math
 import random
 from typing import Optional, Any
 
 # Aliases for common types we will be using in the future
 Card = tuple[int, int]
 Move = tuple[int, int]
+CompactState = tuple[int, int, int, int, int, tuple[int, ...], tuple[int, ...], tuple[int, ...]]
 
 # Mappings that map integers to relevant information to make debugging more accessible
 NUM_TO_RANK = {1: 'Ace', 11: 'Jack', 12: 'Queen', 13: 'King'}
@@ -31,6 +34,112 @@ BET_CODE = 3
 RAISE_CODE = 4
 ALL_IN_CODE = 5
 
+# Compact integer codes for cards (0 to 51), used when game states have to be stored or sent between processes
+CODE_TO_CARD = [(rank, suit) for rank in range(1, 14) for suit in range(1, 5)]
+CARD_TO_CODE = {card: code for code, card in enumerate(CODE_TO_CARD)}
+
+# bit of each straight's cards in a rank mask (bit r for rank r, with aces as both 14 and 1), from the highest straight
+_STRAIGHTS = [(high, 0b11111 << (high - 4)) for high in range(14, 4, -1)]
+
+# random numbers for sampling all-in runouts, kept apart from the random numbers of the cards actually dealt, and
+# seeded from the global random state at the start of every hand that samples them (see seed_runouts)
+_runout_random = random.Random()
+
+
+def seed_runouts(seed: int) -> None:
+    """
+    Seeds the random numbers used to sample all-in runouts (see PokerGame.all_in_equity).
+    """
+    _runout_random.seed(seed)
+
+
+def _fast_card(card: Card) -> Card:
+    """
+    Returns a card with aces ranked 14 and a suit bit, the representation used by _hand_strength.
+    """
+    return (14 if card[0] == 1 else card[0], 1 << card[1])
+
+
+def _straight_high(rank_mask: int) -> int:
+    """
+    Returns the highest rank of the best straight in a rank mask, or 0 if there is none.
+    """
+    if rank_mask & (1 << 14):
+        rank_mask |= 1 << 1  # aces can also be low
+    for high, straight in _STRAIGHTS:
+        if rank_mask & straight == straight:
+            return high
+    return 0
+
+
+def _hand_strength(cards: list[Card]) -> int:
+    """
+    Returns the strength of the best poker hand that can be made from 7 cards (in the representation of _fast_card) as
+    a single int, where a stronger hand has a larger strength and equally strong hands have the same strength. It is a
+    much faster equivalent of comparing the results of PokerGame.rank_poker_hand, used when many runouts have to be
+    evaluated.
+
+    Preconditions:
+    - len(cards) == 7
+    """
+    counts = [0] * 15
+    suit_masks = {}
+    rank_mask = 0
+    for rank, suit in cards:
+        counts[rank] += 1
+        suit_masks[suit] = suit_masks.get(suit, 0) | (1 << rank)
+        rank_mask |= 1 << rank
+
+    flush = 0
+    for suit_mask in suit_masks.values():
+        if bin(suit_mask).count('1') >= 5:
+            straight_flush = _straight_high(suit_mask)
+            if straight_flush:
+                return _strength_key(8, [straight_flush])
+            flush = suit_mask
+
+    quads, trips, pairs, singles = [], [], [], []
+    for rank in range(14, 1, -1):
+        count = counts[rank]
+        if count == 4:
+            quads.append(rank)
+        elif count == 3:
+            trips.append(rank)
+        elif count == 2:
+            pairs.append(rank)
+        elif count == 1:
+            singles.append(rank)
+
+    if quads:
+        kickers = [rank for rank in range(14, 1, -1) if counts[rank] and rank != quads[0]]
+        return _strength_key(7, [quads[0], kickers[0]])
+    if trips and (len(trips) > 1 or pairs):
+        return _strength_key(6, [trips[0], trips[1] if len(trips) > 1 and (not pairs or trips[1] > pairs[0])
+                                 else pairs[0]])
+    if flush:
+        return _strength_key(5, [rank for rank in range(14, 1, -1) if flush & (1 << rank)][:5])
+    straight = _straight_high(rank_mask)
+    if straight:
+        return _strength_key(4, [straight])
+    if trips:
+        return _strength_key(3, [trips[0]] + singles[:2])
+    if len(pairs) > 1:
+        return _strength_key(2, [pairs[0], pairs[1], max(pairs[2:] + singles[:1])])
+    if pairs:
+        return _strength_key(1, [pairs[0]] + singles[:3])
+    return _strength_key(0, singles[:5])
+
+
+def _strength_key(category: int, ranks: list[int]) -> int:
+    """
+    Returns the strength of a hand of the given category (0 for high card up to 8 for straight flush) whose deciding
+    ranks are given from most to least important.
+    """
+    key = category
+    for i in range(5):
+        key = (key << 4) | (ranks[i] if i < len(ranks) else 0)
+    return key
+
 
 class PokerGame:
     """
@@ -52,6 +161,12 @@ class PokerGame:
     - stage: integer representing what stage of the game is being represented (although it could be inferred)
     - turn: integer representing player # - 1, who has to make a move
     - winner: Player # who has won the game; 3 if it's a tie
+    - deck: cards that will be dealt next, in reverse order (the last card is dealt first); if empty, cards are dealt
+      randomly
+    - all_in_runouts: if not None, an all-in is also settled by its expected value: over every possible runout of the
+      remaining community cards if there are at most this many, otherwise over this many random runouts
+    - equity: player 1's share of the pool expected over the runouts of an all-in (a tie counts as half the pool), or
+      None if the game has not been settled by its expected value
 
     Representation Invariants:
     - self.player1_poker_hand == '' or self.player1_poker_hand in NUM_TO_POKER_HAND.values()
@@ -64,6 +179,10 @@ class PokerGame:
     - self.stage <= 5
     - self.turn in {0, 1}
     - self.winner in {1, 2, 3, None}
+    - self.all_in_runouts is None or self.all_in_runouts >= 1
+    - self.equity is None or 0 <= self.equity <= 1
+    - not any(card in self.community_cards or card in self.player1_hand or card in self.player2_hand
+              for card in self.deck)
     """
     player1_hand: set[Card]
     player2_hand: set[Card]
@@ -77,6 +196,9 @@ class PokerGame:
     stage: int
     turn: int
     winner: Optional[int]
+    deck: list[Card]
+    all_in_runouts: Optional[int]
+    equity: Optional[float]
 
     def __init__(self) -> None:
         """
@@ -94,6 +216,9 @@ class PokerGame:
         self.winner = None
         self.player1_poker_hand = ''
         self.player2_poker_hand = ''
+        self.deck = []
+        self.all_in_runouts = None
+        self.equity = None
 
     def __str__(self) -> str:
         """
@@ -170,10 +295,26 @@ class PokerGame:
         self.stage += 1
         self.last_bet = 0
 
+    def load_deck(self, cards: list[Card]) -> None:
+        """
+        Sets the cards that will be dealt in this game, in the order they will be dealt: player 1 and player 2's hands
+        alternate (player 1 first), then the community cards in the order they are revealed.
+
+        Parameters:
+        - cards: the cards to deal
+
+        Preconditions:
+        - self.stage == 0
+        - len(cards) == len(set(cards)) <= 9
+        """
+        self.deck = list(reversed(cards))
+
     def _pick_card(self) -> Card:
         """
-        Generates a random card that remains in the deck
+        Generates a random card that remains in the deck (or deals the next card of a loaded deck)
         """
+        if self.deck:
+            return self.deck.pop()
         card = (random.randint(1, 13), random.randint(1, 4))
         while card in self.community_cards or card in self.player1_hand or card in self.player2_hand:
             card = (random.randint(1, 13), random.randint(1, 4))
@@ -200,6 +341,8 @@ class PokerGame:
 
         # if showdown, add community cards until there are 5
         if all_in:
+            if self.all_in_runouts is not None and len(self.community_cards) < 5:
+                self.equity = self.all_in_equity(self.all_in_runouts)
             while len(self.community_cards) < 5:
                 self.community_cards.add(self._pick_card())
             self.stage = 5
@@ -215,6 +358,39 @@ class PokerGame:
         else:
             return None
 
+    def all_in_equity(self, max_runouts: int) -> float:
+        """
+        Returns player 1's share of the pool expected over the runouts of the remaining community cards, where a tie
+        counts as half the pool. Every runout is enumerated if there are at most max_runouts of them (which is always
+        the case after the flop for max_runouts >= 990), otherwise max_runouts random runouts are sampled.
+
+        Parameters:
+        - max_runouts: the most runouts to evaluate
+
+        Preconditions:
+        - max_runouts >= 1
+        - len(self.player1_hand) == 2 and len(self.player2_hand) == 2
+        """
+        board = [_fast_card(card) for card in self.community_cards]
+        hand1 = [_fast_card(card) for card in self.player1_hand] + board
+        hand2 = [_fast_card(card) for card in self.player2_hand] + board
+        seen = self.community_cards | self.player1_hand | self.player2_hand
+        remaining = [_fast_card(card) for card in CODE_TO_CARD if card not in seen]
+        missing = 5 - len(board)
+        if math.comb(len(remaining), missing) <= max_runouts:
+            runouts = itertools.combinations(remaining, missing)
+        else:
+            runouts = (_runout_random.sample(remaining, missing) for _ in range(max_runouts))
+
+        points = 0
+        total = 0
+        for runout in runouts:
+            strength1 = _hand_strength(hand1 + list(runout))
+            strength2 = _hand_strength(hand2 + list(runout))
+            points += 2 if strength1 > strength2 else (1 if strength1 == strength2 else 0)
+            total += 2
+        return points / total
+
     def determine_winner(self, p1_score: Any, p2_score: Any) -> int:
         """
         Returns who the winner is given strength of poker hands and corresponding tie-breaking mechanisms.
@@ -294,10 +470,10 @@ class PokerGame:
                 buffer += 1
             else:
                 i += 1
-        if i == kickers_allowed:
-            return 3  # tie; split the pot
+        if i == kickers_allowed or i + buffer == len(p1_cards):
+            return 3  # tie; split the pot (hands with fewer cards than kickers, such as before the flop, run out)
         else:
-            return 1 if p1_cards[i][0] > p2_cards[i][0] else 2
+            return 1 if p1_cards[i + buffer][0] > p2_cards[i + buffer][0] else 2
 
     def rank_poker_hand(self, hand: set[Card]) -> tuple[Any, ...]:
         """
@@ -378,9 +554,11 @@ class PokerGame:
         Preconditions:
         - cards is sorted in ascending order
         """
+        if len(cards) < 5:
+            return (False, -1)  # too few cards for a straight, such as a hand before the flop
         temp_cards = cards.copy()
         i = 0
-        while cards[i][0] == 1:
+        while i < len(cards) and cards[i][0] == 1:
             temp_cards.append((14, cards[i][1]))
             i += 1
         counter = 0
@@ -472,7 +650,8 @@ class PokerGame:
 
     def copy(self) -> PokerGame:
         """
-        Returns a new game state object equivalent to the current one.
+        Returns a new game state object equivalent to the current one (the cards left in a loaded deck are not
+        copied).
         """
         copy = PokerGame()
         for i in self.player1_hand:
@@ -490,13 +669,54 @@ class PokerGame:
             copy.community_cards.add(i)
         copy.stage = self.stage
         copy.winner = self.winner
+        copy.all_in_runouts = self.all_in_runouts
+        copy.equity = self.equity
         return copy
 
+    def to_compact(self) -> CompactState:
+        """
+        Returns this game state as a tuple of integers, which is much cheaper to store or send between processes
+        than a copy of the game. The moves are left out, since they can be recovered from the move sequence of the
+        round.
+        """
+        return (self.stage, self.pool, self.last_bet, self.turn, 0 if self.winner is None else self.winner,
+                tuple(CARD_TO_CODE[card] for card in self.player1_hand),
+                tuple(CARD_TO_CODE[card] for card in self.player2_hand),
+                tuple(CARD_TO_CODE[card] for card in self.community_cards))
+
+    @staticmethod
+    def from_compact(state: CompactState, moves: list[Move]) -> PokerGame:
+        """
+        Returns the game state represented by a compact state (see to_compact).
+
+        Parameters:
+        - state: the compact state
+        - moves: the sequence of moves played up to this game state
+
+        Preconditions:
+        - state is an output of to_compact
+        - moves is the move sequence of the game state state was made from
+        """
+        game = PokerGame()
+        game.stage, game.pool, game.last_bet, game.turn, winner = state[:5]
+        game.winner = None if winner == 0 else winner
+        game.player1_hand = {CODE_TO_CARD[code] for code in state[5]}
+        game.player2_hand = {CODE_TO_CARD[code] for code in state[6]}
+        game.community_cards = {CODE_TO_CARD[code] for code in state[7]}
+        # moves always alternate between the players, starting with player 1
+        game.player1_moves = moves[0::2]
+        game.player2_moves = moves[1::2]
+        if game.stage == 5 and game.winner is not None:  # showdown has been evaluated
+            game.player1_poker_hand = NUM_TO_POKER_HAND[game.rank_poker_hand(game.player1_hand)[0]]
+            game.player2_poker_hand = NUM_TO_POKER_HAND[game.rank_poker_hand(game.player2_hand)[0]]
+        return game
+
 
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
-        'extra-imports': ['__future__', 'random', 'typing'],  # the names (strs) of imported modules
+        # the names (strs) of imported modules
+        'extra-imports': ['__future__', 'itertools', 'math', 'random', 'typing'],
         'allowed-io': [''],  # the names (strs) of functions that call print/open/input
         'max-line-length': 120
     })
@@ -0,0 +1,109 @@
+"""
+DeepPoker Project
+
+This module contains functions for summarizing the results of many simulated games of poker with confidence
+intervals, so that players can be compared without playing a fixed (and usually far too large) number of games.
+
+This file is Copyright (c) 2023 Francis Madarang, Sungjin Hong, Sean Kwee, Yenah Lee
+"""
+import math
+
+# z-score of a two-sided 95% confidence interval
+Z_95 = 1.959963984540054
+
+
+def mean_interval(total: float, total_squares: float, n: int, z: float = Z_95) -> tuple[float, float, float]:
+    """
+    Returns the mean of n samples and the lower and upper bounds of its confidence interval (using the normal
+    approximation), given only the sum and the sum of squares of the samples.
+
+    Parameters:
+    - total: the sum of the samples
+    - total_squares: the sum of the squares of the samples
+    - n: the number of samples
+    - z: the z-score of the confidence level
+
+    Preconditions:
+    - n >= 0
+    - z > 0
+    """
+    if n == 0:
+        return (0.0, -math.inf, math.inf)
+    mean = total / n
+    if n == 1:
+        return (mean, -math.inf, math.inf)
+    variance = max(0.0, (total_squares - n * mean * mean) / (n - 1))
+    margin = z * math.sqrt(variance / n)
+    return (mean, mean - margin, mean + margin)
+
+
+def score_interval(wins: int, losses: int, ties: int, z: float = Z_95) -> tuple[float, float, float]:
+    """
+    Returns the mean score of a player (1 for a win, 0.5 for a tie and 0 for a loss) and the lower and upper bounds of
+    its confidence interval.
+
+    Parameters:
+    - wins: the number of games won
+    - losses: the number of games lost
+    - ties: the number of games tied
+    - z: the z-score of the confidence level
+
+    Preconditions:
+    - wins >= 0 and losses >= 0 and ties >= 0
+    - z > 0
+    """
+    return mean_interval(wins + 0.5 * ties, wins + 0.25 * ties, wins + losses + ties, z)
+
+
+def sprt_bounds(alpha: float, beta: float) -> tuple[float, float]:
+    """
+    Returns the lower and upper log-likelihood ratio bounds of a sequential probability ratio test: the test accepts
+    the null hypothesis once the ratio falls below the lower bound, and the alternative hypothesis once it rises above
+    the upper bound.
+
+    Parameters:
+    - alpha: the probability of accepting the alternative hypothesis when the null hypothesis is true
+    - beta: the probability of accepting the null hypothesis when the alternative hypothesis is true
+
+    Preconditions:
+    - 0 < alpha < 1 and 0 < beta < 1
+    """
+    return (math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha))
+
+
+def sprt_llr(total: float, total_squares: float, n: int, mean0: float, mean1: float) -> float:
+    """
+    Returns the log-likelihood ratio of the hypothesis that the samples have mean mean1 over the hypothesis that they
+    have mean mean0, given only the sum and the sum of squares of n samples. The samples are approximated as normally
+    distributed with their observed variance, which suits bounded scores such as 1 for a win, 0.5 for a tie and 0 for
+    a loss.
+
+    Parameters:
+    - total: the sum of the samples
+    - total_squares: the sum of the squares of the samples
+    - n: the number of samples
+    - mean0: the mean of the samples under the null hypothesis
+    - mean1: the mean of the samples under the alternative hypothesis
+
+    Preconditions:
+    - n >= 0
+    """
+    if n < 2:
+        return 0.0
+    mean = total / n
+    variance = (total_squares - n * mean * mean) / n
+    if variance <= 0:
+        # every sample was the same, so the hypothesis whose mean is closer to it is infinitely more likely
+        if abs(mean - mean1) == abs(mean - mean0):
+            return 0.0
+        return math.inf if abs(mean - mean1) < abs(mean - mean0) else -math.inf
+    return n * (mean1 - mean0) * (2 * mean - mean0 - mean1) / (2 * variance)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['math'],  # the names (strs) of imported modules
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120
+    })
@@ -0,0 +1,322 @@
+"""
+DeepPoker Project
+
+This module contains a path-compressed (radix) form of a game tree. Most deep paths of a trained tree are long chains of
+nodes with one subtree each that were followed by the same games; a RadixGameTree stores such a chain as a single node
+labelled with the sequence of classes of action of the chain, and only splits it when a path that leaves the chain part
+of the way along it is inserted.
+
+This file is Copyright (c) 2023 Francis Madarang, Sungjin Hong, Sean Kwee, Yenah Lee
+"""
+from __future__ import annotations
+from collections import Counter
+from typing import Iterable, Iterator, Optional, Sequence
+from poker_game import Move, PokerGame
+from game_tree import GameTree
+
+_tagger = GameTree()  # game tree object to access the methods that compute classes of action
+
+
+class RadixGameTree:
+    """
+    A path-compressed game tree. Each node stands for a chain of nodes of the equivalent GameTree, all of which were
+    followed by the same games, so they share the node's game counts.
+
+    Instance Attributes:
+    - label: the classes of action of the chain of nodes this node stands for, in order; empty for the root
+    - subtrees: the subtrees following the last node of the chain, by the first classes of action of their labels
+    - good_outcomes_in_route: good outcomes in the route of each node of the chain.
+    - total_games_in_route: the amount of games in the route of each node of the chain.
+
+    Representation Invariants:
+    - all(c == self.subtrees[c].label[0] for c in self.subtrees)
+    - all(len(subtree.label) >= 1 for subtree in self.subtrees.values())
+    - self.total_games_in_route >= self.good_outcomes_in_route
+    """
+    label: tuple[int, ...]
+    subtrees: dict[int, RadixGameTree]
+    good_outcomes_in_route: int
+    total_games_in_route: int
+
+    __slots__ = ('label', 'subtrees', 'good_outcomes_in_route', 'total_games_in_route')
+
+    def __init__(self, label: tuple[int, ...] = ()) -> None:
+        """
+        Initializer for a node standing for the given chain of classes of action, followed by no games.
+        """
+        self.label = label
+        self.subtrees = {}
+        self.good_outcomes_in_route = 0
+        self.total_games_in_route = 0
+
+    def insert_path(self, path: Sequence[int], good_outcome: bool, count: int = 1) -> None:
+        """
+        Inserts a path of classes of action (as returned by GameTree.tag_moves) into the tree, counting count games
+        along the path, all of which had a good outcome if good_outcome is True.
+
+        Parameters:
+        - path: the classes of action of each node along the path, starting from the child of this node's chain
+        - good_outcome: whether the games had a good outcome
+        - count: the number of games following the path
+
+        Preconditions:
+        - count >= 1
+        """
+        self._insert_counts(path, count if good_outcome else 0, count)
+
+    def insert_paths(self, tagged_paths: Iterable[tuple[Sequence[int], bool]]) -> None:
+        """
+        Inserts many paths of classes of action into the tree, counting identical paths with the same outcome together
+        first, as in GameTree.insert_paths.
+
+        Parameters:
+        - tagged_paths: (path, whether its game had a good outcome) for every game
+        """
+        counts = Counter((tuple(path), good_outcome) for path, good_outcome in tagged_paths)
+        for (path, good_outcome), count in counts.items():
+            self.insert_path(path, good_outcome, count)
+
+    def merge(self, other: RadixGameTree) -> None:
+        """
+        Adds the games of another tree to this tree, as if every game inserted into other had also been inserted into
+        this tree.
+
+        Parameters:
+        - other: the tree to merge into this tree
+
+        Preconditions:
+        - self.label == other.label
+        """
+        for path, good, total in other._ending_paths():
+            self._insert_counts(path, good, total)
+
+    def _insert_counts(self, path: Sequence[int], good: int, total: int) -> None:
+        """
+        Inserts a path into the tree, counting total games along it, good of which had a good outcome. A chain is split
+        where the path leaves it or ends part of the way along it; the rest of a path that is new to the tree is added
+        as a single node.
+
+        Preconditions:
+        - 0 <= good <= total
+        """
+        tree = self
+        tree.good_outcomes_in_route += good
+        tree.total_games_in_route += total
+        i = 0
+        while i < len(path):
+            subtree = tree.subtrees.get(path[i])
+            if subtree is None:
+                subtree = RadixGameTree(tuple(path[i:]))
+                tree.subtrees[path[i]] = subtree
+            else:
+                shared = 1
+                label = subtree.label
+                while shared < len(label) and i + shared < len(path) and label[shared] == path[i + shared]:
+                    shared += 1
+                if shared < len(label):
+                    subtree._split(shared)
+            subtree.good_outcomes_in_route += good
+            subtree.total_games_in_route += total
+            i += len(subtree.label)
+            tree = subtree
+
+    def _split(self, length: int) -> None:
+        """
+        Splits the chain of this node after its first length nodes, moving the rest of the chain into a new subtree
+        with this node's subtrees and game counts.
+
+        Preconditions:
+        - 1 <= length < len(self.label)
+        """
+        rest = RadixGameTree(self.label[length:])
+        rest.subtrees = self.subtrees
+        rest.good_outcomes_in_route = self.good_outcomes_in_route
+        rest.total_games_in_route = self.total_games_in_route
+        self.label = self.label[:length]
+        self.subtrees = {rest.label[0]: rest}
+
+    def _ending_paths(self) -> Iterator[tuple[tuple[int, ...], int, int]]:
+        """
+        Yields (path, good outcomes, total games) for the games ending at the end of each chain of this tree, with the
+        paths starting from the child of this node's chain.
+        """
+        stack = [((), self)]
+        while stack:
+            path, tree = stack.pop()
+            good = tree.good_outcomes_in_route - sum(s.good_outcomes_in_route for s in tree.subtrees.values())
+            total = tree.total_games_in_route - sum(s.total_games_in_route for s in tree.subtrees.values())
+            if total > 0:
+                yield (path, good, total)
+            for subtree in reversed(tree.subtrees.values()):
+                stack.append((path + subtree.label, subtree))
+
+    def count_nodes(self) -> int:
+        """
+        Returns the number of nodes of this tree.
+        """
+        return 1 + sum(subtree.count_nodes() for subtree in self.subtrees.values())
+
+    def to_game_tree(self) -> GameTree:
+        """
+        Returns the GameTree equivalent to this tree, which is the same as the GameTree the paths of this tree would
+        have been inserted into.
+
+        Preconditions:
+        - self.label == ()
+        """
+        tree = GameTree()
+        self._expand_into(tree)
+        return tree
+
+    def _expand_into(self, tree: GameTree) -> None:
+        """
+        Adds the counts and subtrees of this node to the GameTree node at the end of its chain.
+        """
+        tree.good_outcomes_in_route = self.good_outcomes_in_route
+        tree.total_games_in_route = self.total_games_in_route
+        for subtree in self.subtrees.values():
+            node = tree
+            for classes_of_action in subtree.label:
+                node.add_subtree(classes_of_action)
+                node = node.subtrees[classes_of_action]
+                node.good_outcomes_in_route = subtree.good_outcomes_in_route
+                node.total_games_in_route = subtree.total_games_in_route
+            subtree._expand_into(node)
+
+    def root(self) -> RadixPosition:
+        """
+        Returns the position at the root of this tree, to follow it like a GameTree.
+
+        Preconditions:
+        - self.label == ()
+        """
+        return RadixPosition(self, 0)
+
+
+def compress_tree(tree: GameTree) -> RadixGameTree:
+    """
+    Returns the RadixGameTree equivalent to a GameTree.
+
+    Preconditions:
+    - tree.classes_of_action is None
+    """
+    radix = RadixGameTree()
+    _compress_into(tree, radix)
+    return radix
+
+
+def _compress_into(tree: GameTree, radix: RadixGameTree) -> None:
+    """
+    Adds the counts and subtrees of a GameTree node to the RadixGameTree node whose chain ends at it.
+    """
+    radix.good_outcomes_in_route = tree.good_outcomes_in_route
+    radix.total_games_in_route = tree.total_games_in_route
+    for classes_of_action, subtree in tree.subtrees.items():
+        label = [classes_of_action]
+        # extend the chain while the next node has a single subtree followed by all of its games
+        while len(subtree.subtrees) == 1:
+            child = next(iter(subtree.subtrees.values()))
+            if (child.total_games_in_route, child.good_outcomes_in_route) != \
+                    (subtree.total_games_in_route, subtree.good_outcomes_in_route):
+                break
+            label.append(child.classes_of_action)
+            subtree = child
+        node = RadixGameTree(tuple(label))
+        radix.subtrees[classes_of_action] = node
+        _compress_into(subtree, node)
+
+
+class RadixPosition:
+    """
+    A node of the GameTree equivalent to a RadixGameTree: the node after the first depth classes of action of the chain
+    of a RadixGameTree node. It can be followed like a GameTree (see find_subtree and best_subtree).
+
+    Instance Attributes:
+    - tree: the RadixGameTree node whose chain this position is on
+    - depth: the number of nodes of the chain up to and including this position
+
+    Representation Invariants:
+    - 0 <= self.depth <= len(self.tree.label)
+    - self.depth >= 1 or self.tree.label == ()
+    """
+    tree: RadixGameTree
+    depth: int
+
+    __slots__ = ('tree', 'depth')
+
+    def __init__(self, tree: RadixGameTree, depth: int) -> None:
+        """
+        Initializer for the position after the first depth classes of action of the chain of tree.
+        """
+        self.tree = tree
+        self.depth = depth
+
+    @property
+    def classes_of_action(self) -> Optional[int]:
+        """
+        The classes of action of this node, or None for the root.
+        """
+        return self.tree.label[self.depth - 1] if self.depth > 0 else None
+
+    @property
+    def good_outcomes_in_route(self) -> int:
+        """
+        The good outcomes in the route of this node.
+        """
+        return self.tree.good_outcomes_in_route
+
+    @property
+    def total_games_in_route(self) -> int:
+        """
+        The amount of games in the route of this node.
+        """
+        return self.tree.total_games_in_route
+
+    @property
+    def move_confidence_value(self) -> float:
+        """
+        The confidence value of this node, as in GameTree.
+        """
+        total = self.tree.total_games_in_route
+        return 0.0 if total == 0 else self.tree.good_outcomes_in_route / total
+
+    def find_subtree(self, classes_of_action: int) -> Optional[RadixPosition]:
+        """
+        Returns the subtree of this node for the given classes of action, or None if it has not encountered them.
+        """
+        if self.depth < len(self.tree.label):
+            if self.tree.label[self.depth] == classes_of_action:
+                return RadixPosition(self.tree, self.depth + 1)
+            return None
+        subtree = self.tree.subtrees.get(classes_of_action)
+        return None if subtree is None else RadixPosition(subtree, 1)
+
+    def best_subtree(self) -> Optional[RadixPosition]:
+        """
+        Returns the subtree with the highest confidence value (the one GameTree.best_subtree would return), or None if
+        this node has no subtrees.
+        """
+        if self.depth < len(self.tree.label):
+            return RadixPosition(self.tree, self.depth + 1)
+        best_so_far = None
+        for subtree in self.tree.subtrees.values():
+            position = RadixPosition(subtree, 1)
+            if best_so_far is None or best_so_far.move_confidence_value < position.move_confidence_value:
+                best_so_far = position
+        return best_so_far
+
+    def get_classes_of_action(self, move: Move, game_state: PokerGame, following: int, evaluated: bool,
+                              evaluate_move: bool = True) -> int:
+        """
+        Returns the classes of action of a move, as in GameTree.get_classes_of_action.
+        """
+        return _tagger.get_classes_of_action(move, game_state, following, evaluated, evaluate_move)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'collections', 'typing', 'poker_game', 'game_tree'],
+        'allowed-io': [],
+        'max-line-length': 120
+    })
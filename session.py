@@ -0,0 +1,193 @@
+"""
+DeepPoker Project
+
+This module contains a class representing a match (or session) of many consecutive rounds of heads up poker between
+the same two players, where balances carry over from round to round and the dealer alternates every round.
+
+This file is Copyright (c) 2023 Francis Madarang, Sungjin Hong, Sean Kwee, Yenah Lee
+"""
+from __future__ import annotations
+from typing import Optional
+from player import Player
+from game_runner import iter_round, ACTION_EVENT, SHOWDOWN_EVENT, END_EVENT, NUM_TO_ACTION
+
+
+class Session:
+    """
+    A match of consecutive rounds of poker between two players. The same player objects are reused for every round
+    (they are reset with reset_hand), and all statistics are kept in counters that are allocated once.
+
+    Instance Attributes:
+    - players: the two players in the match, player 1 first
+    - small_blind: the small blind paid by the dealer every round
+    - big_blind: the big blind paid by the other player every round
+    - rebuy_to: the balance a player is topped back up to once they cannot pay the big blind; if None, the match ends
+      instead
+    - all_in_runouts: if not None, the pool of an all-in is split by each player's expected share over up to this many
+      runouts (see PokerGame.all_in_runouts) instead of going to the winner of the one runout dealt
+    - dealer: the player # (1 or 2) who is the dealer in the next round
+    - hands_played: the number of rounds played so far
+    - showdowns: the number of rounds that ended in a showdown
+    - wins: wins[i] is the number of rounds won by player i + 1; wins[2] is the number of ties
+    - chips_won: chips_won[i] is the net amount of currency won by player i + 1 over the match
+    - action_counts: action_counts[i][code] is the number of times player i + 1 played the move with that code
+
+    Representation Invariants:
+    - len(self.players) == 2
+    - 0 <= self.small_blind <= self.big_blind
+    - self.dealer in {1, 2}
+    - self.showdowns <= self.hands_played
+    - sum(self.wins) == self.hands_played
+    """
+    players: list[Player]
+    small_blind: int
+    big_blind: int
+    rebuy_to: Optional[int]
+    all_in_runouts: Optional[int]
+    dealer: int
+    hands_played: int
+    showdowns: int
+    wins: list[int]
+    chips_won: list[int]
+    action_counts: list[list[int]]
+
+    def __init__(self, player1: Player, player2: Player, big_blind: int, small_blind: Optional[int] = None,
+                 rebuy_to: Optional[int] = None, all_in_runouts: Optional[int] = None) -> None:
+        """
+        Initializer for a match between player1 and player2, where player 1 is the first dealer.
+
+        Preconditions:
+        - big_blind > 0
+        - small_blind is None or 0 <= small_blind <= big_blind
+        - rebuy_to is None or rebuy_to >= big_blind
+        - all_in_runouts is None or all_in_runouts >= 1
+        """
+        self.players = [player1, player2]
+        self.big_blind = big_blind
+        self.small_blind = big_blind // 2 if small_blind is None else small_blind
+        self.rebuy_to = rebuy_to
+        self.all_in_runouts = all_in_runouts
+        self.dealer = 1
+        self.hands_played = 0
+        self.showdowns = 0
+        self.wins = [0, 0, 0]
+        self.chips_won = [0, 0]
+        self.action_counts = [[0] * len(NUM_TO_ACTION), [0] * len(NUM_TO_ACTION)]
+
+    def __str__(self) -> str:
+        """
+        Summarizes the statistics of the match so far.
+        """
+        output_msg = f'{self.hands_played} rounds played, {self.showdown_rate():.1%} went to showdown, ' \
+                     f'{self.wins[2]} ties\n'
+        for i in range(2):
+            frequencies = self.action_frequencies(i + 1)
+            output_msg += f'Player {i + 1} ({type(self.players[i]).__name__}): {self.wins[i]} wins, ' \
+                          f'{self.chips_won[i]} currency won, {self.big_blinds_per_100(i + 1):.2f} bb/100, ' \
+                          f'{", ".join(f"{NUM_TO_ACTION[code]} {frequencies[code]:.1%}" for code in NUM_TO_ACTION)}\n'
+        return output_msg
+
+    def play(self, hands: int) -> int:
+        """
+        Plays up to the given number of rounds, and returns how many were played. Unless players can rebuy, the match
+        stops early once a player can no longer pay the big blind.
+
+        Parameters:
+        - hands: the maximum number of rounds to play
+
+        Preconditions:
+        - hands >= 0
+        """
+        played = 0
+        while played < hands and self.play_round() is not None:
+            played += 1
+        return played
+
+    def play_round(self) -> Optional[int]:
+        """
+        Plays a single round, pays the pool out to its winner and rotates the dealer. Returns the winner of the round
+        (the player # of player 1 or player 2, or 3 if it was a tie), or None if the round could not be played because
+        a player cannot pay the big blind.
+        """
+        for player in self.players:
+            if player.balance < self.big_blind:
+                if self.rebuy_to is None:
+                    return None
+                player.balance = self.rebuy_to
+        balances_before = [self.players[0].balance, self.players[1].balance]
+        # seat 0 of the game (the dealer's seat) belongs to whoever is dealing this round
+        seat_to_player = [0, 1] if self.dealer == 1 else [1, 0]
+        for player in self.players:
+            player.reset_hand()
+
+        winner, pool, equity = None, 0, None
+        for event in iter_round(self.players[0], self.players[1], dealer=self.dealer,
+                                blinds=(self.small_blind, self.big_blind), all_in_runouts=self.all_in_runouts):
+            if event[0] == ACTION_EVENT:
+                self.action_counts[seat_to_player[event[2]]][event[3][0]] += 1
+            elif event[0] == SHOWDOWN_EVENT:
+                self.showdowns += 1
+            elif event[0] == END_EVENT:
+                winner, pool, equity = event[1], event[2], event[3]
+
+        if equity is not None:  # split the pool by expected value, still counting the runout dealt as the result
+            share = round(pool * equity)
+            self.players[seat_to_player[0]].balance += share
+            self.players[seat_to_player[1]].balance += pool - share
+            result = 3 if winner == 3 else seat_to_player[winner - 1] + 1
+        elif winner == 3:  # split the pool, with any odd chip going to the dealer
+            self.players[seat_to_player[0]].balance += pool - pool // 2
+            self.players[seat_to_player[1]].balance += pool // 2
+            result = 3
+        else:
+            result = seat_to_player[winner - 1] + 1
+            self.players[result - 1].balance += pool
+        self.wins[result - 1 if result != 3 else 2] += 1
+        for i in range(2):
+            self.chips_won[i] += self.players[i].balance - balances_before[i]
+        self.hands_played += 1
+        self.dealer = 2 if self.dealer == 1 else 1
+        return result
+
+    def big_blinds_per_100(self, player_num: int) -> float:
+        """
+        Returns how many big blinds the given player has won per 100 rounds.
+
+        Parameters:
+        - player_num: the player #
+
+        Preconditions:
+        - player_num in {1, 2}
+        """
+        if self.hands_played == 0:
+            return 0.0
+        return self.chips_won[player_num - 1] / self.big_blind / self.hands_played * 100
+
+    def showdown_rate(self) -> float:
+        """
+        Returns the proportion of rounds that ended in a showdown.
+        """
+        return self.showdowns / self.hands_played if self.hands_played > 0 else 0.0
+
+    def action_frequencies(self, player_num: int) -> list[float]:
+        """
+        Returns the proportion of the given player's moves that were of each move code (indexed by move code).
+
+        Parameters:
+        - player_num: the player #
+
+        Preconditions:
+        - player_num in {1, 2}
+        """
+        counts = self.action_counts[player_num - 1]
+        total = sum(counts)
+        return [count / total if total > 0 else 0.0 for count in counts]
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'typing', 'player', 'game_runner'],  # the names (strs) of imported modules
+        'allowed-io': [],  # the names (strs) of functions that call print/open/input
+        'max-line-length': 120
+    })
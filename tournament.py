@@ -0,0 +1,301 @@
+"""
+DeepPoker Project
+
+This module contains a round-robin tournament between playstyles (subclasses of Player), where every pairing of
+players is simulated across a pool of worker processes. The progress of a tournament is saved after every batch of
+games, so an interrupted tournament can be resumed where it left off.
+
+This file is Copyright (c) 2023 Francis Madarang, Sungjin Hong, Sean Kwee, Yenah Lee
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Optional
+import copy
+import json
+import os
+import random
+import time
+import player
+import NaivePlayer
+from player import Player
+from tree_player import TreePlayer
+from game_runner import iter_round, DEAL_EVENT, END_EVENT
+from poker_statistics import score_interval
+
+# A player in the tournament: the name of its class and, for a TreePlayer, the game tree file it loads
+PlayerSpec = tuple[str, Optional[str]]
+
+PLAYER_CLASSES = {'CheckPlayer': player.CheckPlayer, 'TestingPlayer': player.TestingPlayer,
+                  'AggressivePlayer': player.AggressivePlayer, 'ConservativePlayer': player.ConservativePlayer,
+                  'NaivePlayer': NaivePlayer.NaivePlayer, 'PrototypeNaivePlayer': player.NaivePlayer,
+                  'TreePlayer': TreePlayer}
+
+# number of games played by the first batch of a pairing, which is used to measure how fast the pairing plays
+PROBE_GAMES = 20
+
+# players used by the current worker process, made once per worker for each player in the tournament
+_worker_templates = {}
+
+
+def make_player(spec: PlayerSpec, balance: int = 10000) -> Player:
+    """
+    Returns a new player for the given player spec. TreePlayers load their game tree and do not explore.
+
+    Parameters:
+    - spec: the player spec
+    - balance: the starting balance of the player
+
+    Preconditions:
+    - spec[0] in PLAYER_CLASSES
+    - spec[0] != 'TreePlayer' or spec[1] is not None
+    """
+    if spec[0] == 'TreePlayer':
+        new_player = TreePlayer(balance, spec[1])
+        new_player.exploring = False
+        return new_player
+    return PLAYER_CLASSES[spec[0]](balance)
+
+
+def spec_name(spec: PlayerSpec) -> str:
+    """
+    Returns the name of a player spec used in tables and progress files.
+    """
+    return spec[0] if spec[1] is None else f'{spec[0]}({spec[1]})'
+
+
+class Tournament:
+    """
+    A round-robin tournament in which every pair of players plays the same number of games against each other.
+
+    Instance Attributes:
+    - specs: the players in the tournament
+    - games_per_pairing: the number of games each pair of players plays
+    - progress_file: the file the progress of the tournament is saved to (and resumed from), or None
+    - results: maps the name of each pairing ('<player a> vs <player b>') to [player a's wins, player b's wins, ties,
+      games played, seconds spent simulating]
+
+    Representation Invariants:
+    - len(self.specs) >= 2
+    - self.games_per_pairing > 0
+    - all(self.results[pairing][3] <= self.games_per_pairing for pairing in self.results)
+    """
+    specs: list[PlayerSpec]
+    games_per_pairing: int
+    progress_file: Optional[str]
+    results: dict[str, list[float]]
+
+    def __init__(self, specs: list[PlayerSpec], games_per_pairing: int, progress_file: Optional[str] = None) -> None:
+        """
+        Initializer for a tournament. If the progress file exists, the results saved in it are loaded, and a ValueError
+        is raised if it was saved by a tournament with different players or games per pairing.
+
+        Preconditions:
+        - len(specs) >= 2
+        - games_per_pairing > 0
+        """
+        self.specs = specs
+        self.games_per_pairing = games_per_pairing
+        self.progress_file = progress_file
+        self.results = {}
+        for a, b in self._pairings():
+            self.results[self._pairing_name(a, b)] = [0, 0, 0, 0, 0.0]
+        if progress_file is not None and os.path.exists(progress_file):
+            with open(progress_file, 'r') as reader:
+                saved = json.load(reader)
+            if saved.get('specs') != [list(spec) for spec in specs] or \
+                    saved.get('games_per_pairing') != games_per_pairing:
+                raise ValueError(f'{progress_file} holds the progress of a tournament with different players or games '
+                                 f'per pairing')
+            self.results = saved['results']
+
+    def run(self, workers: Optional[int] = None, seconds_per_batch: float = 5.0) -> None:
+        """
+        Plays all the remaining games of the tournament across a pool of worker processes.
+
+        Games are submitted in batches sized from the measured games per second of each pairing, so every batch takes
+        about seconds_per_batch, and the pairings with the most remaining work are scheduled first.
+
+        Parameters:
+        - workers: the number of worker processes (defaults to the number of cores)
+        - seconds_per_batch: roughly how long each batch of games should take
+
+        Preconditions:
+        - workers is None or workers >= 1
+        - seconds_per_batch > 0
+        """
+        max_in_flight = workers or os.cpu_count() or 1
+        in_flight = {self._pairing_name(a, b): 0 for a, b in self._pairings()}
+        pending = {}
+        with ProcessPoolExecutor(max_workers=workers, initializer=random.seed) as executor:
+            while True:
+                while len(pending) < max_in_flight:
+                    batch = self._next_batch(in_flight, seconds_per_batch)
+                    if batch is None:
+                        break
+                    a, b, games = batch
+                    in_flight[self._pairing_name(a, b)] += games
+                    pending[executor.submit(_play_batch, self.specs[a], self.specs[b], games)] = (a, b, games)
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    a, b, games = pending.pop(future)
+                    pairing = self._pairing_name(a, b)
+                    in_flight[pairing] -= games
+                    batch_result = future.result()
+                    for i in range(5):
+                        self.results[pairing][i] += batch_result[i]
+                self._save_progress()
+
+    def _next_batch(self, in_flight: dict[str, int], seconds_per_batch: float) -> Optional[tuple[int, int, int]]:
+        """
+        Returns the next batch of games to play as (index of player a, index of player b, games), or None if every
+        remaining game has already been scheduled. Pairings that have not been timed yet are probed first; otherwise
+        the pairing with the longest estimated remaining time goes first.
+
+        Parameters:
+        - in_flight: the number of games of each pairing that are currently being played
+        - seconds_per_batch: roughly how long the batch should take
+        """
+        best = None
+        best_priority = None
+        for a, b in self._pairings():
+            pairing = self._pairing_name(a, b)
+            result = self.results[pairing]
+            remaining = self.games_per_pairing - result[3] - in_flight[pairing]
+            if remaining <= 0:
+                continue
+            if result[3] == 0:
+                if in_flight[pairing] > 0:
+                    continue  # wait for the probe to measure the speed of the pairing
+                priority = (1, 0.0)
+            else:
+                priority = (0, remaining * result[4] / result[3])
+            if best_priority is None or priority > best_priority:
+                best = (a, b, remaining)
+                best_priority = priority
+
+        if best is None:
+            return None
+        a, b, remaining = best
+        result = self.results[self._pairing_name(a, b)]
+        if result[3] == 0:
+            return (a, b, min(PROBE_GAMES, remaining))
+        games_per_second = result[3] / max(result[4], 1e-9)
+        return (a, b, max(1, min(remaining, int(games_per_second * seconds_per_batch))))
+
+    def _save_progress(self) -> None:
+        """
+        Saves the results so far to the progress file (if there is one), replacing it atomically so an interruption
+        never leaves a half-written file behind.
+        """
+        if self.progress_file is None:
+            return
+        temp_file = self.progress_file + '.tmp'
+        with open(temp_file, 'w') as writer:
+            json.dump({'specs': self.specs, 'games_per_pairing': self.games_per_pairing, 'results': self.results},
+                      writer)
+        os.replace(temp_file, self.progress_file)
+
+    def table(self) -> str:
+        """
+        Returns a table of the results of every pairing, followed by the standings of every player (sorted by their
+        score over all their games). Scores are 1 for a win, 0.5 for a tie and 0 for a loss, with 95% confidence
+        intervals.
+        """
+        lines = [f'{"Player A":<32} {"Player B":<32} {"Games":>8} {"A score":>8} {"95% CI":>17} {"Games/s":>9}']
+        totals = {spec_name(spec): [0, 0, 0] for spec in self.specs}
+        for a, b in self._pairings():
+            name_a, name_b = spec_name(self.specs[a]), spec_name(self.specs[b])
+            wins_a, wins_b, ties, games, seconds = self.results[self._pairing_name(a, b)]
+            score, low, high = score_interval(wins_a, wins_b, ties)
+            games_per_second = games / seconds if seconds > 0 else 0.0
+            lines.append(f'{name_a:<32} {name_b:<32} {games:>8} {score:>8.3f} '
+                         f'{f"[{low:.3f}, {high:.3f}]":>17} {games_per_second:>9.1f}')
+            for name, wins, losses in ((name_a, wins_a, wins_b), (name_b, wins_b, wins_a)):
+                totals[name][0] += wins
+                totals[name][1] += losses
+                totals[name][2] += ties
+
+        lines.append('')
+        lines.append(f'{"Player":<32} {"Games":>8} {"Score":>8} {"95% CI":>17}')
+        standings = sorted(totals.items(), key=lambda item: score_interval(*item[1])[0], reverse=True)
+        for name, (wins, losses, ties) in standings:
+            score, low, high = score_interval(wins, losses, ties)
+            lines.append(f'{name:<32} {wins + losses + ties:>8} {score:>8.3f} {f"[{low:.3f}, {high:.3f}]":>17}')
+        return '\n'.join(lines) + '\n'
+
+    def write_table(self, destination: str) -> None:
+        """
+        Writes the results table (see table) to a file, overriding its contents.
+
+        Parameters:
+        - destination: the file to write to
+        """
+        with open(destination, 'w') as writer:
+            writer.write(self.table())
+
+    def _pairings(self) -> list[tuple[int, int]]:
+        """
+        Returns the indices of every pair of players in the tournament.
+        """
+        return [(a, b) for a in range(len(self.specs)) for b in range(a + 1, len(self.specs))]
+
+    def _pairing_name(self, a: int, b: int) -> str:
+        """
+        Returns the name of the pairing between the players at the given indices.
+        """
+        return f'{spec_name(self.specs[a])} vs {spec_name(self.specs[b])}'
+
+
+def _play_batch(spec_a: PlayerSpec, spec_b: PlayerSpec, games: int) -> tuple[int, int, int, int, float]:
+    """
+    Plays a batch of games between two players in a worker process and returns (player a's wins, player b's wins,
+    ties, games, seconds taken). Every game starts from a fresh copy of each player, so balances do not carry over.
+    The seconds taken do not include loading the players, so they measure how fast the pairing plays.
+
+    Parameters:
+    - spec_a: the spec of player a
+    - spec_b: the spec of player b
+    - games: the number of games to play
+
+    Preconditions:
+    - games >= 1
+    """
+    for spec in (spec_a, spec_b):
+        if spec not in _worker_templates:  # load each player (and its game tree) once per worker
+            _worker_templates[spec] = make_player(spec)
+    start = time.perf_counter()
+    wins = [0, 0, 0]
+    for _ in range(games):
+        dealer = 1
+        winner = 3
+        for event in iter_round(copy.copy(_worker_templates[spec_a]), copy.copy(_worker_templates[spec_b])):
+            if event[0] == DEAL_EVENT:
+                dealer = event[1]
+            elif event[0] == END_EVENT:
+                winner = event[1]
+        if winner == 3:
+            wins[2] += 1
+        else:
+            # the dealer gets player 1's seat in the game
+            wins[0 if (winner == 1) == (dealer == 1) else 1] += 1
+    return (wins[0], wins[1], wins[2], games, time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    all_specs = [('CheckPlayer', None), ('TestingPlayer', None), ('AggressivePlayer', None),
+                 ('ConservativePlayer', None), ('NaivePlayer', None), ('PrototypeNaivePlayer', None),
+                 ('TreePlayer', 'destination.txt')]
+    tournament = Tournament(all_specs, 1000, 'tournament_progress.json')
+    tournament.run()
+    tournament.write_table('tournament_results.txt')
+    print(tournament.table())
+
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'concurrent.futures', 'typing', 'copy', 'json', 'os', 'random', 'time',
+                          'player', 'NaivePlayer', 'tree_player', 'game_runner', 'poker_statistics'],
+        'allowed-io': ['Tournament.__init__', 'Tournament._save_progress', 'Tournament.write_table'],
+        'max-line-length': 120
+    })
@@ -0,0 +1,507 @@
+"""
+DeepPoker Project
+
+This module contains parallel training of game trees, either offline from stored hand histories or from rounds
+simulated by the workers themselves.
+
+Offline, tagging each round with its classes of action (which enumerates the cards that could come) is spread over a
+pool of worker processes, while the cheap updates of the tree's counters happen in the main process, so trees can be
+retrained with different settings from the same hand histories without simulating any rounds again. When simulating,
+each worker trains a private tree that is merged into the main tree. When the rounds are played against the tree being
+trained (as in the exploration phase of learning), simulation processes feed a single learner through a pipeline.
+
+This file is Copyright (c) 2023 Francis Madarang, Sungjin Hong, Sean Kwee, Yenah Lee
+"""
+from __future__ import annotations
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterable, Optional, Union
+import copy
+import itertools
+import multiprocessing
+import os
+import pickle
+import queue
+import random
+import tempfile
+import time
+import game_tree
+from game_tree import GameTree
+from game_runner import expand_history, iter_round, run_round, DEAL_EVENT, ACTION_EVENT
+from hand_history import read_hand_history
+from poker_game import PokerGame, Move, CompactState
+from player import Player
+from tree_checkpoint import TreeCheckpoint
+from tree_snapshot import TreeSnapshotter
+
+# a path of classes of action through a game tree and whether its game had a good outcome, with how many games took it
+TaggedPath = tuple[tuple[tuple[int, ...], bool], int]
+
+# game tree used by tagging workers to call the tagging methods (which do not depend on the contents of the tree)
+_tagger = GameTree()
+
+# players used by the current training worker process, made once per worker
+_trainer_players = []
+
+
+def train_from_history(files: list[str], tree: Optional[GameTree] = None, workers: Optional[int] = None,
+                       chunk_size: int = 200, threat_constant: int = game_tree.THREAT_CONSTANT) -> GameTree:
+    """
+    Returns a game tree trained on every round in the given hand history files (see hand_history), learning from both
+    how player 1 and player 2 played, exactly as if the rounds had been inserted with GameTree.insert_moves.
+
+    Parameters:
+    - files: the hand history files, read in order
+    - tree: the tree to train further; a new tree if None
+    - workers: the number of tagging processes (defaults to the number of cores); 1 tags in this process
+    - chunk_size: the number of rounds sent to a worker at a time
+    - threat_constant: the THREAT_CONSTANT to tag the rounds with
+
+    Preconditions:
+    - tree is None or tree.classes_of_action is None
+    - workers is None or workers >= 1
+    - chunk_size >= 1
+    - threat_constant >= 1
+    """
+    records = itertools.chain.from_iterable(read_hand_history(file) for file in files)
+    return train_from_records(records, tree, workers, chunk_size, threat_constant)
+
+
+def train_from_records(records: Iterable[tuple[list[Move], list[CompactState]]], tree: Optional[GameTree] = None,
+                       workers: Optional[int] = None, chunk_size: int = 200,
+                       threat_constant: int = game_tree.THREAT_CONSTANT) -> GameTree:
+    """
+    Same as train_from_history, but for (move sequence, compact game states) records of rounds, such as those read by
+    hand_history.read_hand_history. Records are only taken from the iterable as workers need them.
+
+    Preconditions:
+    - tree is None or tree.classes_of_action is None
+    - workers is None or workers >= 1
+    - chunk_size >= 1
+    - threat_constant >= 1
+    """
+    if tree is None:
+        tree = GameTree()
+    records = iter(records)
+    if workers == 1:
+        old_threat_constant = game_tree.THREAT_CONSTANT
+        game_tree.THREAT_CONSTANT = threat_constant
+        try:
+            chunk = list(itertools.islice(records, chunk_size))
+            while chunk:
+                _insert_tagged_paths(tree, _tag_chunk(chunk))
+                chunk = list(itertools.islice(records, chunk_size))
+        finally:
+            game_tree.THREAT_CONSTANT = old_threat_constant
+        return tree
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_tagger, initargs=(threat_constant,)) as executor:
+        # chunks are inserted in the order they were read, so the tree comes out the same every time
+        max_in_flight = 2 * (workers or os.cpu_count() or 1)
+        pending = deque()
+        chunk = list(itertools.islice(records, chunk_size))
+        while chunk or pending:
+            while chunk and len(pending) < max_in_flight:
+                pending.append(executor.submit(_tag_chunk, chunk))
+                chunk = list(itertools.islice(records, chunk_size))
+            _insert_tagged_paths(tree, pending.popleft().result())
+    return tree
+
+
+def train_parallel(rounds: int, player1_factory: Callable[[], Player], player2_factory: Callable[[], Player],
+                   tree: Optional[GameTree] = None, workers: Optional[int] = None, shard_size: int = 500,
+                   threat_constant: int = game_tree.THREAT_CONSTANT,
+                   checkpoint: Optional[TreeCheckpoint] = None) -> GameTree:
+    """
+    Returns a game tree trained on the given number of simulated rounds, learning from both how player 1 and player 2
+    played. Every worker process simulates shards of rounds and trains a private tree on each shard, which is sent
+    back and merged into the returned tree (see GameTree.merge), so training speeds up almost linearly with the
+    number of workers.
+
+    Parameters:
+    - rounds: the number of rounds to simulate
+    - player1_factory: picklable function with no parameters that returns player1's equivalent player
+    - player2_factory: same as player1_factory but for player2
+    - tree: the tree to train further; a new tree if None
+    - workers: the number of worker processes (defaults to the number of cores); 1 trains in this process
+    - shard_size: the number of rounds a worker trains on before its tree is merged
+    - threat_constant: the THREAT_CONSTANT to tag the rounds with
+    - checkpoint: if given, the checkpoint of the tree, which the shards are merged through and which is written
+      whenever it is due and at the end of training
+
+    Preconditions:
+    - rounds >= 0
+    - tree is None or tree.classes_of_action is None
+    - workers is None or workers >= 1
+    - shard_size >= 1
+    - threat_constant >= 1
+    - checkpoint is None or checkpoint.tree is tree
+    """
+    if tree is None:
+        tree = GameTree()
+    learner = tree if checkpoint is None else checkpoint
+    shards = [min(shard_size, rounds - i) for i in range(0, rounds, shard_size)]
+    if workers == 1:
+        old_threat_constant = game_tree.THREAT_CONSTANT
+        game_tree.THREAT_CONSTANT = threat_constant
+        _trainer_players[:] = [player1_factory(), player2_factory()]
+        try:
+            for shard in shards:
+                learner.merge(_train_shard(shard))
+                if checkpoint is not None:
+                    checkpoint.checkpoint_if_due()
+        finally:
+            game_tree.THREAT_CONSTANT = old_threat_constant
+        if checkpoint is not None:
+            checkpoint.checkpoint()
+        return tree
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_trainer,
+                             initargs=(player1_factory, player2_factory, threat_constant)) as executor:
+        # merging in the order the shards were started keeps the order of the tree's subtrees the same every time
+        max_in_flight = 2 * (workers or os.cpu_count() or 1)
+        pending = deque()
+        next_shard = 0
+        while next_shard < len(shards) or pending:
+            while next_shard < len(shards) and len(pending) < max_in_flight:
+                pending.append(executor.submit(_train_shard, shards[next_shard]))
+                next_shard += 1
+            learner.merge(pending.popleft().result())
+            if checkpoint is not None:
+                checkpoint.checkpoint_if_due()
+    if checkpoint is not None:
+        checkpoint.checkpoint()
+    return tree
+
+
+class TrainingPipeline:
+    """
+    A training pipeline for the exploration phase of a game tree, where simulation processes play rounds between a
+    player 1 that explores or follows a game tree (such as a TreePlayer) and player 2, and a learner (the process that
+    runs the pipeline) inserts every round into the tree.
+
+    Simulators play against a read-only snapshot of the tree that the learner refreshes every refresh_every rounds
+    (written in the background, see tree_snapshot, so the learner keeps inserting rounds while it is written), tag
+    their rounds with their classes of action (the costly part of learning from a round), and send the tagged paths to
+    the learner in batches over a bounded queue, so simulators wait (instead of filling up memory) whenever the learner
+    falls behind. Whether player 1 explores in each round follows the schedule in
+    thresholds, as in the learning loop of tree_player.
+
+    Instance Attributes:
+    - player1_factory: picklable function with no parameters that returns player 1's equivalent player, which must
+      have the games_played and exploring attributes of a TreePlayer
+    - player2_factory: same as player1_factory but for player 2 (without the attribute requirements)
+    - thresholds: player 1 explores in round i if a random number in [0, 1) is at most thresholds[i]
+    - refresh_every: the number of rounds the learner inserts between snapshots of the tree
+    - batch_size: the number of rounds a simulator sends to the learner at a time
+    - queue_size: the most batches that can wait for the learner before simulators have to wait
+    - rounds_simulated: the number of rounds simulated in the last run
+    - simulate_seconds: the seconds simulators spent playing and tagging rounds in the last run, summed over simulators
+    - blocked_seconds: the seconds simulators spent waiting for room in the queue in the last run, summed over
+      simulators
+    - snapshot_loads: the number of times simulators loaded a snapshot in the last run
+    - learn_seconds: the seconds the learner spent inserting rounds in the last run
+    - idle_seconds: the seconds the learner spent waiting for rounds in the last run
+    - snapshot_seconds: the seconds the learner spent taking snapshots in the last run
+    - max_snapshot_seconds: the longest the learner spent taking a snapshot in the last run
+    - snapshots: the number of snapshots written in the last run
+    - wall_seconds: the duration of the last run
+    - workers: the number of simulators in the last run
+
+    Representation Invariants:
+    - self.refresh_every >= 1
+    - self.batch_size >= 1
+    - self.queue_size >= 1
+    """
+    player1_factory: Callable[[], Player]
+    player2_factory: Callable[[], Player]
+    thresholds: list[float]
+    refresh_every: int
+    batch_size: int
+    queue_size: int
+    rounds_simulated: int
+    simulate_seconds: float
+    blocked_seconds: float
+    snapshot_loads: int
+    learn_seconds: float
+    idle_seconds: float
+    snapshot_seconds: float
+    max_snapshot_seconds: float
+    snapshots: int
+    wall_seconds: float
+    workers: int
+
+    def __init__(self, player1_factory: Callable[[], Player], player2_factory: Callable[[], Player],
+                 thresholds: list[float], refresh_every: int = 100, batch_size: int = 10, queue_size: int = 64) -> None:
+        """
+        Initializer for a training pipeline that plays len(thresholds) rounds.
+
+        Preconditions:
+        - refresh_every >= 1
+        - batch_size >= 1
+        - queue_size >= 1
+        """
+        self.player1_factory = player1_factory
+        self.player2_factory = player2_factory
+        self.thresholds = thresholds
+        self.refresh_every = refresh_every
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self._reset_statistics(0)
+
+    def __str__(self) -> str:
+        """
+        Summarizes the throughput of each stage of the last run.
+        """
+        return f'{self.rounds_simulated} rounds in {self.wall_seconds:.1f}s ' \
+               f'({self.rounds_simulated / max(self.wall_seconds, 1e-9):.1f} rounds/s)\n' \
+               f'Simulators ({self.workers}): {self.rounds_simulated / max(self.simulate_seconds, 1e-9):.1f} ' \
+               f'rounds/s each, {self.blocked_seconds:.1f}s waiting for the learner, ' \
+               f'{self.snapshot_loads} snapshots loaded\n' \
+               f'Learner: {self.rounds_simulated / max(self.learn_seconds, 1e-9):.1f} rounds/s, ' \
+               f'{self.idle_seconds:.1f}s waiting for rounds, {self.snapshots} snapshots taken in ' \
+               f'{self.snapshot_seconds:.1f}s (at most {self.max_snapshot_seconds * 1000:.1f}ms each)\n'
+
+    def run(self, tree: GameTree, workers: Optional[int] = None,
+            checkpoint: Optional[TreeCheckpoint] = None) -> GameTree:
+        """
+        Plays every round of the schedule across simulation processes, inserts them into the given tree, and returns
+        it.
+
+        Parameters:
+        - tree: the tree to train
+        - workers: the number of simulation processes (defaults to one less than the number of cores, leaving one
+          for the learner)
+        - checkpoint: if given, the checkpoint of the tree, which the rounds are inserted through and which is written
+          whenever it is due and at the end of the run
+
+        Preconditions:
+        - tree.classes_of_action is None
+        - workers is None or workers >= 1
+        - checkpoint is None or checkpoint.tree is tree
+        """
+        workers = workers or max(1, (os.cpu_count() or 1) - 1)
+        self._reset_statistics(workers)
+        start = time.perf_counter()
+        records = multiprocessing.Queue(self.queue_size)
+        statistics = multiprocessing.Queue()
+        version = multiprocessing.Value('i', 0, lock=False)
+        snapshot_fd, snapshot_file = tempfile.mkstemp(suffix='.tree')
+        os.close(snapshot_fd)
+        simulators = []
+        snapshotter = TreeSnapshotter(snapshot_file)
+        try:
+            snapshotter.start(tree)
+            snapshotter.wait()
+            if snapshotter.finished():
+                version.value += 1
+            for i in range(workers):
+                simulator = multiprocessing.Process(target=_simulate, args=(
+                    self.player1_factory, self.player2_factory, self.thresholds[i::workers], self.batch_size,
+                    records, statistics, version, snapshot_file), daemon=True)
+                simulator.start()
+                simulators.append(simulator)
+
+            learner = tree if checkpoint is None else checkpoint
+            finished = 0
+            since_snapshot = 0
+            while finished < workers:
+                wait_start = time.perf_counter()
+                batch = _get_batch(records, simulators)
+                learn_start = time.perf_counter()
+                self.idle_seconds += learn_start - wait_start
+                if batch is None:
+                    finished += 1
+                    continue
+                rounds, tagged_paths = batch
+                _insert_tagged_paths(learner, tagged_paths)
+                if checkpoint is not None:
+                    checkpoint.checkpoint_if_due()
+                self.learn_seconds += time.perf_counter() - learn_start
+                since_snapshot += rounds
+                if snapshotter.finished():
+                    version.value += 1  # tell the simulators about the new snapshot
+                if since_snapshot >= self.refresh_every and snapshotter.start(tree):
+                    since_snapshot = 0
+
+            if checkpoint is not None:
+                checkpoint.checkpoint()
+            for _ in range(workers):
+                rounds, simulate_seconds, blocked_seconds, snapshot_loads = statistics.get()
+                self.rounds_simulated += rounds
+                self.simulate_seconds += simulate_seconds
+                self.blocked_seconds += blocked_seconds
+                self.snapshot_loads += snapshot_loads
+            for simulator in simulators:
+                simulator.join()
+        finally:
+            for simulator in simulators:
+                if simulator.is_alive():
+                    simulator.terminate()
+            snapshotter.wait()
+            os.remove(snapshot_file)
+            self.snapshots = snapshotter.snapshots_written
+            self.snapshot_seconds = snapshotter.stall_seconds
+            self.max_snapshot_seconds = snapshotter.max_stall_seconds
+            self.wall_seconds = time.perf_counter() - start
+        return tree
+
+    def _reset_statistics(self, workers: int) -> None:
+        """
+        Resets the throughput statistics for a new run with the given number of simulators.
+        """
+        self.workers = workers
+        self.rounds_simulated = 0
+        self.simulate_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.snapshot_loads = 0
+        self.learn_seconds = 0.0
+        self.idle_seconds = 0.0
+        self.snapshot_seconds = 0.0
+        self.max_snapshot_seconds = 0.0
+        self.snapshots = 0
+        self.wall_seconds = 0.0
+
+
+def _get_batch(records: Any, simulators: list[Any]) -> Optional[tuple[int, list[TaggedPath]]]:
+    """
+    Returns the next batch of rounds from the simulators, as (number of rounds, their tagged paths), or None once a
+    simulator has finished, raising an error instead of waiting forever if a simulator crashed.
+    """
+    while True:
+        try:
+            return records.get(timeout=1.0)
+        except queue.Empty:
+            if any(simulator.exitcode not in {None, 0} for simulator in simulators):
+                raise RuntimeError('a simulator of the training pipeline crashed')
+
+
+def _simulate(player1_factory: Callable[[], Player], player2_factory: Callable[[], Player], thresholds: list[float],
+              batch_size: int, records: Any, statistics: Any, version: Any, snapshot_file: str) -> None:
+    """
+    Plays a simulator's share of the rounds of a TrainingPipeline, sending them to the learner in batches followed by
+    None, and then sends (rounds, seconds simulating, seconds blocked, snapshots loaded) to the statistics queue. Each
+    batch is tagged here (see _tag_chunk) and sent as (number of rounds, tagged paths), so tagging, the costly part of
+    learning from a round, runs in every simulator instead of in the single learner.
+    """
+    random.seed()  # forked simulators would otherwise all share the same random state
+    player1, player2 = player1_factory(), player2_factory()
+    snapshot = None
+    snapshot_version = 0
+    snapshot_loads = 0
+    simulate_seconds = 0.0
+    blocked_seconds = 0.0
+    batch = []
+    for threshold in thresholds:
+        simulate_start = time.perf_counter()
+        if version.value != snapshot_version:
+            snapshot_version = version.value
+            with open(snapshot_file, 'rb') as reader:
+                snapshot = pickle.load(reader)
+            snapshot_loads += 1
+        p1 = copy.copy(player1)
+        p1.games_played = snapshot
+        # decide whether to explore new strategies or not
+        p1.exploring = random.random() <= threshold
+        game = PokerGame()
+        states = []
+        for event in iter_round(p1, copy.copy(player2), game):
+            if event[0] in {DEAL_EVENT, ACTION_EVENT}:
+                states.append(game.to_compact())
+        batch.append((game.get_move_sequence(), states))
+        if len(batch) == batch_size:
+            tagged_paths = _tag_chunk(batch)
+            simulate_seconds += time.perf_counter() - simulate_start
+            blocked_start = time.perf_counter()
+            records.put((len(batch), tagged_paths))
+            blocked_seconds += time.perf_counter() - blocked_start
+            batch = []
+        else:
+            simulate_seconds += time.perf_counter() - simulate_start
+    if batch:
+        records.put((len(batch), _tag_chunk(batch)))
+    records.put(None)
+    statistics.put((len(thresholds), simulate_seconds, blocked_seconds, snapshot_loads))
+
+
+def _init_trainer(player1_factory: Callable[[], Player], player2_factory: Callable[[], Player],
+                  threat_constant: int) -> None:
+    """
+    Sets up a training worker process of train_parallel.
+
+    Parameters:
+    - player1_factory: function that returns player1's equivalent player
+    - player2_factory: function that returns player2's equivalent player
+    - threat_constant: the THREAT_CONSTANT to tag rounds with
+    """
+    random.seed()  # forked workers would otherwise all share the same random state
+    game_tree.THREAT_CONSTANT = threat_constant
+    _trainer_players.clear()
+    _trainer_players.extend([player1_factory(), player2_factory()])
+
+
+def _train_shard(rounds: int) -> GameTree:
+    """
+    Returns a new game tree trained on the given number of rounds between copies of this worker's players.
+
+    Preconditions:
+    - len(_trainer_players) == 2
+    """
+    tagged_paths = []
+    for _ in range(rounds):
+        result = run_round(copy.copy(_trainer_players[0]), copy.copy(_trainer_players[1]), False)
+        result[-1].check_winner()
+        move_sequence = result[-1].get_move_sequence()
+        # learn from both how p1 could have played and how p2 could have played
+        tagged_paths.append(_tagger.tag_moves(move_sequence, result, 0))
+        tagged_paths.append(_tagger.tag_moves(move_sequence, result, 1))
+    tree = GameTree()
+    tree.insert_paths(tagged_paths)
+    return tree
+
+
+def _insert_tagged_paths(tree: Union[GameTree, TreeCheckpoint], tagged_paths: list[TaggedPath]) -> None:
+    """
+    Inserts tagged paths (as returned by _tag_chunk) into a game tree, or into the tree of a checkpoint.
+    """
+    for (path, good_outcome), count in tagged_paths:
+        tree.insert_path(path, good_outcome, count)
+
+
+def _init_tagger(threat_constant: int) -> None:
+    """
+    Sets up a tagging worker process of train_from_records.
+
+    Parameters:
+    - threat_constant: the THREAT_CONSTANT to tag rounds with
+    """
+    game_tree.THREAT_CONSTANT = threat_constant
+
+
+def _tag_chunk(records: list[tuple[list[Move], list[CompactState]]]) -> list[TaggedPath]:
+    """
+    Returns the tagged paths of a chunk of rounds, following both player 1 and player 2 in every round. Rounds that
+    took the same path with the same outcome are counted together, in the order they first appear.
+    """
+    tagged_paths = Counter()
+    for move_sequence, states in records:
+        result = expand_history(move_sequence, states)
+        result[-1].check_winner()
+        for following in (0, 1):
+            path, good_outcome = _tagger.tag_moves(move_sequence, result, following)
+            tagged_paths[(tuple(path), good_outcome)] += 1
+    return list(tagged_paths.items())
+
+
+if __name__ == '__main__':
+    trained_tree = train_from_history(['hand_history.bin'])
+
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'collections', 'concurrent.futures', 'typing', 'copy', 'itertools',
+                          'multiprocessing', 'os', 'pickle', 'queue', 'random', 'tempfile', 'time', 'game_tree',
+                          'game_runner', 'hand_history', 'poker_game', 'player', 'tree_checkpoint',
+                          'tree_snapshot'],
+        'allowed-io': ['_simulate'],
+        'max-line-length': 120
+    })
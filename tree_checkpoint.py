@@ -0,0 +1,353 @@
+"""
+DeepPoker Project
+
+This module contains incremental checkpoints of a game tree being trained. A checkpoint is a base game tree file (see
+tree_file) and an append-only log of the games inserted into the tree since the base was written. Each checkpoint
+appends only the paths whose game counts changed since the previous one, so checkpointing costs time proportional to
+the games played since then rather than to the size of the tree, and a crash loses at most the games since the last
+checkpoint. Compacting folds the log into a new base file, which checkpoint_if_due does once the log has grown to
+compact_ratio times the size of the base file, so the log takes about as long to replay as the base file takes to load
+and the cost of compacting is spread over the checkpoints since the last one.
+
+A log file starts with an 8 byte magic string, the generation of its base file (8 byte little endian int) and the
+vocabulary of classes of action (see tree_file.write_vocabulary). The base file of generation g of the log file f is
+f'{f}.{g}.tree'. Each checkpoint follows as a record made of its length in bytes (4 byte little endian int) and then
+the number of paths (4 byte little endian int), followed by each path as its number of nodes (2 byte little endian
+int), the classes of action of each node, and the good outcomes and total games ending at the path (8 byte little endian
+ints each). A record cut short by a crash is ignored when the log is loaded.
+
+This file is Copyright (c) 2023 Francis Madarang, Sungjin Hong, Sean Kwee, Yenah Lee
+"""
+from __future__ import annotations
+from collections import Counter
+from typing import BinaryIO, Callable, Iterable, Iterator, Optional, Sequence
+import os
+import struct
+import time
+from game_tree import GameTree
+from tree_file import load_tree, save_tree, read_vocabulary, vocabulary_translator, write_vocabulary
+
+LOG_MAGIC = b'DPTLOG01'
+GENERATION = struct.Struct('<Q')
+LENGTH = struct.Struct('<I')
+PATH_LENGTH = struct.Struct('<H')
+COUNTS = struct.Struct('<QQ')
+
+
+class TreeCheckpoint:
+    """
+    A game tree being trained together with its checkpoint files. The tree is trained through insert_path, insert_paths
+    and merge, which record the games they add until the next call to checkpoint writes them to the log. Changes made
+    directly to tree are not recorded, so they are lost on a crash and are only saved by the next compaction.
+
+    Instance Attributes:
+    - tree: the game tree being trained, which must only be changed through this checkpoint
+    - file: the name of the log file
+    - generation: the generation of the current base file
+    - checkpoints: the number of checkpoints in the log since the base file was written
+    - fsync: whether each checkpoint waits for the log to reach the disk
+    - every_seconds: the seconds after a checkpoint at which checkpoint_if_due writes the next one
+    - compact_ratio: the size of the log, relative to the base file, at which checkpoint_if_due compacts, or None to
+      only compact when compact is called
+    - log_size: the number of bytes of checkpoints in the log
+    - base_size: the number of bytes of the current base file
+
+    Representation Invariants:
+    - self.tree.classes_of_action is None
+    - self.generation >= 0
+    - self.checkpoints >= 0
+    - self.every_seconds >= 0
+    - self.compact_ratio is None or self.compact_ratio > 0
+    """
+    tree: GameTree
+    file: str
+    generation: int
+    checkpoints: int
+    fsync: bool
+    every_seconds: float
+    compact_ratio: Optional[float]
+    log_size: int
+    base_size: int
+    _last_checkpoint: float
+    _pending: dict[tuple[int, ...], list[int]]
+    _writer: BinaryIO
+
+    def __init__(self, tree: GameTree, file: str, every_seconds: float = 5.0, fsync: bool = True,
+                 generation: int = 0, compact_ratio: Optional[float] = 1.0) -> None:
+        """
+        Initializer for a new checkpoint of the given tree, which writes the tree as the base file and starts an empty
+        log, overriding the log file.
+
+        Preconditions:
+        - tree.classes_of_action is None
+        - every_seconds >= 0
+        - generation >= 0
+        - compact_ratio is None or compact_ratio > 0
+        """
+        self.tree = tree
+        self.file = file
+        self.every_seconds = every_seconds
+        self.compact_ratio = compact_ratio
+        self.fsync = fsync
+        self._last_checkpoint = time.perf_counter()
+        self.generation = generation
+        self.checkpoints = 0
+        self._pending = {}
+        self._writer = _start_log(tree, file, generation)
+        self.log_size = 0
+        self.base_size = os.path.getsize(base_file(file, generation))
+
+    def __enter__(self) -> TreeCheckpoint:
+        """
+        Returns the checkpoint, so it can be used in a with statement that closes it.
+        """
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """
+        Writes a last checkpoint and closes the log at the end of a with statement.
+        """
+        self.close()
+
+    def insert_path(self, path: Sequence[int], good_outcome: bool, count: int = 1) -> None:
+        """
+        Inserts a path into the tree, as GameTree.insert_path, and records it for the next checkpoint.
+
+        Preconditions:
+        - count >= 1
+        """
+        self.tree.insert_path(path, good_outcome, count)
+        self._record(tuple(path), count if good_outcome else 0, count)
+
+    def insert_paths(self, tagged_paths: Iterable[tuple[Sequence[int], bool]]) -> None:
+        """
+        Inserts many paths into the tree, as GameTree.insert_paths, and records them for the next checkpoint.
+
+        Parameters:
+        - tagged_paths: (path, whether its game had a good outcome) for every game
+        """
+        counts = Counter((tuple(path), good_outcome) for path, good_outcome in tagged_paths)
+        for (path, good_outcome), count in counts.items():
+            self.insert_path(path, good_outcome, count)
+
+    def merge(self, other: GameTree) -> None:
+        """
+        Adds the games of another tree to the tree, as GameTree.merge, and records them for the next checkpoint.
+
+        Preconditions:
+        - other.classes_of_action is None
+        """
+        self.tree.merge(other)
+        for path, good, total in other.ending_paths():
+            self._record(path, good, total)
+
+    def _record(self, path: tuple[int, ...], good: int, total: int) -> None:
+        """
+        Adds games ending at the given path to the games to write at the next checkpoint.
+        """
+        counts = self._pending.get(path)
+        if counts is None:
+            self._pending[path] = [good, total]
+        else:
+            counts[0] += good
+            counts[1] += total
+
+    def checkpoint_if_due(self) -> None:
+        """
+        Writes a checkpoint if every_seconds have passed since the last one, and compacts if the log has grown to
+        compact_ratio times the size of the base file.
+        """
+        if time.perf_counter() - self._last_checkpoint >= self.every_seconds:
+            self.checkpoint()
+            if self.compact_ratio is not None and self.log_size >= self.compact_ratio * self.base_size:
+                self.compact()
+
+    def checkpoint(self) -> None:
+        """
+        Appends the games inserted since the last checkpoint to the log, so they survive a crash.
+        """
+        self._last_checkpoint = time.perf_counter()
+        if not self._pending:
+            return
+        record = bytearray(LENGTH.pack(len(self._pending)))
+        for path, (good, total) in self._pending.items():
+            record += PATH_LENGTH.pack(len(path))
+            record += struct.pack(f'<{len(path)}Q', *path)
+            record += COUNTS.pack(good, total)
+        self._writer.write(LENGTH.pack(len(record)) + record)
+        self.log_size += LENGTH.size + len(record)
+        self._writer.flush()
+        if self.fsync:
+            os.fsync(self._writer.fileno())
+        self._pending.clear()
+        self.checkpoints += 1
+
+    def compact(self) -> None:
+        """
+        Writes the whole tree as a new base file and starts an empty log for it, then removes the old base file. The
+        checkpoint files describe the tree at every moment, so a crash while compacting loses nothing.
+        """
+        self._pending.clear()
+        self._writer.close()
+        old_base = base_file(self.file, self.generation)
+        self.generation += 1
+        self._writer = _start_log(self.tree, self.file, self.generation)
+        self.checkpoints = 0
+        self.log_size = 0
+        self.base_size = os.path.getsize(base_file(self.file, self.generation))
+        os.remove(old_base)
+
+    def close(self) -> None:
+        """
+        Writes a last checkpoint and closes the log.
+        """
+        if not self._writer.closed:
+            self.checkpoint()
+            self._writer.close()
+
+
+def base_file(file: str, generation: int) -> str:
+    """
+    Returns the name of the base file of the given generation of a log file.
+    """
+    return f'{file}.{generation}.tree'
+
+
+def load_checkpoint(file: str) -> GameTree:
+    """
+    Returns the game tree at the last checkpoint written to a log file: its base file with every checkpoint of the log
+    replayed into it.
+
+    Preconditions:
+    - file was written by a TreeCheckpoint
+    """
+    tree = load_tree(base_file(file, _read_generation(file)))
+    for path, good, total in iter_log(file):
+        if good > 0:
+            tree.insert_path(path, True, good)
+        if total > good:
+            tree.insert_path(path, False, total - good)
+    return tree
+
+
+def resume_checkpoint(file: str, every_seconds: float = 5.0, fsync: bool = True,
+                      compact_ratio: Optional[float] = 1.0) -> TreeCheckpoint:
+    """
+    Returns a TreeCheckpoint continuing from the last checkpoint written to a log file, after compacting it.
+
+    Preconditions:
+    - file was written by a TreeCheckpoint
+    """
+    generation = _read_generation(file)
+    tree = load_checkpoint(file)
+    old_base = base_file(file, generation)
+    checkpoint = TreeCheckpoint(tree, file, every_seconds, fsync, generation + 1, compact_ratio)
+    os.remove(old_base)
+    return checkpoint
+
+
+def iter_log(file: str) -> Iterator[tuple[tuple[int, ...], int, int]]:
+    """
+    Yields (path, good outcomes, total games) for every path in every complete checkpoint of a log file, in the order
+    they were written.
+
+    Preconditions:
+    - file was written by a TreeCheckpoint
+    """
+    with open(file, 'rb') as reader:
+        translate = _read_log_header(reader, file)[1]
+        while True:
+            length_bytes = reader.read(LENGTH.size)
+            if len(length_bytes) < LENGTH.size:
+                return
+            length = LENGTH.unpack(length_bytes)[0]
+            record = reader.read(length)
+            if len(record) < length:
+                return  # the last checkpoint was cut short
+            offset = LENGTH.size
+            for _ in range(LENGTH.unpack_from(record, 0)[0]):
+                path_length = PATH_LENGTH.unpack_from(record, offset)[0]
+                offset += PATH_LENGTH.size
+                path = struct.unpack_from(f'<{path_length}Q', record, offset)
+                offset += 8 * path_length
+                good, total = COUNTS.unpack_from(record, offset)
+                offset += COUNTS.size
+                yield (tuple(translate(classes_of_action) for classes_of_action in path), good, total)
+
+
+def _start_log(tree: GameTree, file: str, generation: int) -> BinaryIO:
+    """
+    Writes the base file of the given generation for the tree and replaces the log file with an empty log for it,
+    returning the log opened for appending. Each file is written under a temporary name, synced to the disk and
+    renamed into place, the base file first, and the renames are synced too, so even after a power loss the log always
+    matches a base file on the disk, and an old base file can be removed once this returns.
+    """
+    base = base_file(file, generation)
+    save_tree(tree, base + '.tmp')
+    with open(base + '.tmp', 'rb') as reader:
+        os.fsync(reader.fileno())
+    os.replace(base + '.tmp', base)
+    _fsync_directory(file)
+    with open(file + '.tmp', 'wb') as writer:
+        writer.write(LOG_MAGIC + GENERATION.pack(generation))
+        write_vocabulary(writer)
+        writer.flush()
+        os.fsync(writer.fileno())
+    os.replace(file + '.tmp', file)
+    _fsync_directory(file)
+    return open(file, 'ab')
+
+
+def _fsync_directory(file: str) -> None:
+    """
+    Syncs the directory holding a file to the disk, so the files renamed into it survive a power loss. Platforms that
+    cannot open directories (Windows) skip this.
+    """
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    descriptor = os.open(os.path.dirname(os.path.abspath(file)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def remove_checkpoint(file: str) -> None:
+    """
+    Removes a log file and its current base file, such as once the trained tree has been saved elsewhere.
+
+    Preconditions:
+    - file was written by a TreeCheckpoint that has been closed
+    """
+    generation = _read_generation(file)
+    os.remove(file)
+    os.remove(base_file(file, generation))
+
+
+def _read_generation(file: str) -> int:
+    """
+    Returns the generation of the base file of a log file.
+    """
+    with open(file, 'rb') as reader:
+        return _read_log_header(reader, file)[0]
+
+
+def _read_log_header(reader: BinaryIO, file: str) -> tuple[int, Callable[[int], int]]:
+    """
+    Reads the header of a log file, and returns the generation of its base file and a function translating classes of
+    action written with the log's vocabulary to the vocabulary of game_tree.TAGS.
+    """
+    if reader.read(len(LOG_MAGIC)) != LOG_MAGIC:
+        raise ValueError(f'{file} is not a game tree checkpoint log')
+    generation = GENERATION.unpack(reader.read(GENERATION.size))[0]
+    return (generation, vocabulary_translator(read_vocabulary(reader), file))
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'collections', 'typing', 'os', 'struct', 'time', 'game_tree', 'tree_file'],
+        'allowed-io': ['_start_log', '_read_generation', 'iter_log'],
+        'max-line-length': 120,
+        'disable': ['R1732']  # the log stays open until the checkpoint is closed
+    })
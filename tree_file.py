@@ -0,0 +1,217 @@
+"""
+DeepPoker Project
+
+This module contains a compact binary file format for game trees, which stores every node once instead of one line per
+root-to-leaf path (see tree_player.print_to_file), and a streaming writer and reader for it, so saving and loading a
+tree takes time and space proportional to its number of nodes.
+
+A game tree file starts with an 8 byte magic string and the vocabulary of classes of action it was written with: the
+number of names (2 byte little endian int), followed by each name in UTF-8, preceded by its length in bytes (1 byte).
+The nodes follow in preorder, each as NODE_SIZE bytes: its classes of action as an int with bit i set for the i-th
+name of the vocabulary (0 for the root), its good outcomes and total games (8 byte little endian ints each), and its
+number of subtrees (4 byte little endian int). A file written with a different vocabulary than game_tree.TAGS is
+translated to the current one when it is read.
+
+Game tree files (and the text files of tree_player.print_to_file) can be compressed: a file whose name ends in one of
+the extensions of COMPRESSORS is compressed and decompressed as it is streamed, with only a small part of it in memory
+at a time (see open_tree_file).
+
+This file is Copyright (c) 2023 Francis Madarang, Sungjin Hong, Sean Kwee, Yenah Lee
+"""
+from __future__ import annotations
+from typing import IO, BinaryIO, Callable, Iterator
+import bz2
+import gzip
+import lzma
+import os
+import struct
+from game_tree import GameTree, TAGS, TAG_IDS
+
+MAGIC = b'DPTREE01'
+COUNT = struct.Struct('<H')
+NODE = struct.Struct('<QQQI')
+NODE_SIZE = NODE.size
+
+# the functions opening compressed files, by the extensions of their names
+COMPRESSORS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+
+
+def open_tree_file(file: str, mode: str = 'rb') -> IO:
+    """
+    Opens a file, compressing or decompressing it as it is written or read if its name ends in one of the extensions
+    of COMPRESSORS. The mode is as for open, such as 'rb', 'wb', 'rt' or 'wt'.
+    """
+    return COMPRESSORS.get(os.path.splitext(file)[1], open)(file, mode)
+
+
+def uncompressed_name(file: str) -> str:
+    """
+    Returns the name of a file without the extension of its compression, if it is compressed.
+    """
+    name, extension = os.path.splitext(file)
+    return name if extension in COMPRESSORS else file
+
+
+def is_tree_file(file: str) -> bool:
+    """
+    Returns whether the given file is a game tree file, rather than a file written by tree_player.print_to_file.
+    """
+    with open_tree_file(file, 'rb') as reader:
+        return reader.read(len(MAGIC)) == MAGIC
+
+
+def save_tree(tree: GameTree, destination: str, buffer_size: int = 1 << 20) -> None:
+    """
+    Writes a game tree to a game tree file, overriding its contents. The tree is walked without recursion and written
+    in blocks of about buffer_size bytes. Any subtree can be written as a tree of its own, but its classes of action
+    are not read back by load_tree.
+
+    Parameters:
+    - tree: the game tree to write
+    - destination: the file to write to
+    - buffer_size: the number of bytes collected before they are written to the file
+    """
+    with open_tree_file(destination, 'wb') as writer:
+        writer.write(MAGIC)
+        write_vocabulary(writer)
+        buffer = bytearray()
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            buffer += NODE.pack(node.classes_of_action or 0, node.good_outcomes_in_route, node.total_games_in_route,
+                                len(node.subtrees))
+            # pushed in reverse, so subtrees are written (and read back) in their order in the tree
+            stack.extend(reversed(node.subtrees.values()))
+            if len(buffer) >= buffer_size:
+                writer.write(buffer)
+                buffer.clear()
+        writer.write(buffer)
+
+
+def iter_tree_file(file: str, block_size: int = 1 << 20) -> Iterator[tuple[int, int, int, int]]:
+    """
+    Yields (classes of action, good outcomes, total games, number of subtrees) for every node of a game tree file in
+    preorder, reading the file in blocks of about block_size bytes. The classes of action are translated to the
+    vocabulary of game_tree.TAGS.
+
+    Parameters:
+    - file: the name of the game tree file
+    - block_size: the number of bytes read from the file at a time
+
+    Preconditions:
+    - is_tree_file(file)
+    """
+    with open_tree_file(file, 'rb') as reader:
+        translate = _read_header(reader, file)
+        block_size -= block_size % NODE_SIZE
+        leftover = b''
+        while True:
+            block = reader.read(block_size)
+            if not block:
+                break
+            block = leftover + block
+            end = len(block) - len(block) % NODE_SIZE
+            for classes_of_action, good, total, num_subtrees in NODE.iter_unpack(memoryview(block)[:end]):
+                yield (translate(classes_of_action), good, total, num_subtrees)
+            leftover = block[end:]
+        if leftover:
+            raise ValueError(f'{file} ends in the middle of a node')
+
+
+def load_tree(file: str) -> GameTree:
+    """
+    Returns the game tree stored in a game tree file.
+
+    Parameters:
+    - file: the name of the game tree file
+
+    Preconditions:
+    - is_tree_file(file)
+    """
+    nodes = iter_tree_file(file)
+    root = GameTree()
+    _, root.good_outcomes_in_route, root.total_games_in_route, num_subtrees = next(nodes)
+    # (node, number of its subtrees still to be read) for every node whose subtrees are being read
+    stack = [(root, num_subtrees)]
+    for classes_of_action, good, total, num_subtrees in nodes:
+        while stack[-1][1] == 0:
+            stack.pop()
+        parent, remaining = stack[-1]
+        stack[-1] = (parent, remaining - 1)
+        node = GameTree(classes_of_action)
+        node.good_outcomes_in_route = good
+        node.total_games_in_route = total
+        parent.subtrees[classes_of_action] = node
+        stack.append((node, num_subtrees))
+    return root
+
+
+def write_vocabulary(writer: BinaryIO) -> int:
+    """
+    Writes the vocabulary of classes of action (game_tree.TAGS) to a binary file, and returns the number of bytes
+    written.
+    """
+    vocabulary = bytearray(COUNT.pack(len(TAGS)))
+    for name in TAGS:
+        encoded = name.encode()
+        vocabulary.append(len(encoded))
+        vocabulary += encoded
+    writer.write(vocabulary)
+    return len(vocabulary)
+
+
+def read_vocabulary(reader: BinaryIO) -> list[str]:
+    """
+    Reads a vocabulary of classes of action written by write_vocabulary from a binary file.
+    """
+    names = []
+    for _ in range(COUNT.unpack(reader.read(COUNT.size))[0]):
+        length = reader.read(1)[0]
+        names.append(reader.read(length).decode())
+    return names
+
+
+def _read_header(reader: BinaryIO, file: str) -> Callable[[int], int]:
+    """
+    Reads the magic string and vocabulary of a game tree file, and returns a function translating classes of action
+    written with the file's vocabulary to the vocabulary of game_tree.TAGS.
+    """
+    if reader.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f'{file} is not a game tree file')
+    return vocabulary_translator(read_vocabulary(reader), file)
+
+
+def vocabulary_translator(names: list[str], file: str) -> Callable[[int], int]:
+    """
+    Returns a function translating classes of action written with the given vocabulary (read from the given file) to
+    the vocabulary of game_tree.TAGS.
+    """
+    if names == TAGS:
+        return lambda classes_of_action: classes_of_action
+    for name in names:
+        if name not in TAG_IDS:
+            raise ValueError(f'unknown class of action in {file}: {name!r}')
+    bits = [1 << TAG_IDS[name] for name in names]
+
+    def translate(classes_of_action: int) -> int:
+        """
+        Returns the classes of action with the bits of the file's vocabulary moved to the bits of game_tree.TAGS.
+        """
+        translated = 0
+        i = 0
+        while classes_of_action:
+            if classes_of_action & 1:
+                translated |= bits[i]
+            classes_of_action >>= 1
+            i += 1
+        return translated
+    return translate
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'typing', 'bz2', 'gzip', 'lzma', 'os', 'struct', 'game_tree'],
+        'allowed-io': ['open_tree_file'],
+        'max-line-length': 120
+    })
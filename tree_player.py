@@ -8,12 +8,19 @@ This module contains a subclass of Player -- TreePlayer -- that can:
 
 This file is Copyright (c) 2023 Francis Madarang, Sungjin Hong, Sean Kwee, Yenah Lee
 """
-import copy
 import random
+from functools import partial
+from typing import Optional, Union
 from player import Player, NaivePlayer, TestingPlayer
-from game_tree import GameTree, Card
+from game_tree import GameTree, Card, tag_names
+from frozen_tree import FrozenGameTree, freeze_tree, is_flat_tree_file, open_frozen_tree, save_frozen_tree
+from tree_file import is_tree_file, load_tree, save_tree, open_tree_file, uncompressed_name
+from tree_shards import load_sharded, save_sharded
 from poker_game import PokerGame
-from game_runner import run_round, NUM_TO_ACTION
+from game_runner import NUM_TO_ACTION
+from training import train_parallel, TrainingPipeline
+from tree_checkpoint import TreeCheckpoint, remove_checkpoint
+from session import Session
 
 # Static variables for move constants; consistent across all modules
 FOLD_CODE = 0
@@ -31,22 +38,28 @@ class TreePlayer(Player):
 
     Instance Attributes:
     - games_played: A game tree representing all sequences of classes of action (just a fancy name for 'tags' that
-    categorize the situation the AI finds itself in) that it has ever encountered
+    categorize the situation the AI finds itself in) that it has ever encountered; a FrozenGameTree (see freeze) when
+    the player only plays with what it has learned
     - choices: A list containing all possible move codes
     - new_stage: Whether the game this player is involved in has reached a new stage (Pre-flop to flop, etc.)
     - exploring: Whether the player should be trying new strategies or not
     - old_comm_cards: The community cards in the previous state of the game that this player is playing in
+    - tree_root: The game tree this player starts every round from when it plays many rounds in a row (taken from
+    games_played the first time the player is reset for a new round)
+    - explores_by_default: Whether the player starts every round exploring (taken alongside tree_root)
 
     Representation Invariants:
     - self.games_played.classes_of_action is None
     - all(choice in {FOLD_CODE, RAISE_CODE, BET_CODE, CALL_CODE, CHECK_CODE, ALL_IN_CODE} for choice in self.choices)
     - len(self.old_comm_cards) <= 5
     """
-    games_played: GameTree
+    games_played: Union[GameTree, FrozenGameTree]
     choices: list[int]
     new_stage: bool
     exploring: bool
     old_comm_cards: set[Card]
+    tree_root: Optional[Union[GameTree, FrozenGameTree]]
+    explores_by_default: bool
 
     def __init__(self, balance: int, file: str = 'bruh.kkax') -> None:
         """
@@ -63,6 +76,8 @@ class TreePlayer(Player):
         self.games_played = GameTree() if file == 'bruh.kkax' else self.load_game_tree(file)
         self.exploring = True
         self.old_comm_cards = set()
+        self.tree_root = None
+        self.explores_by_default = True
 
     def make_move(self, game_state: PokerGame, player_num: int) -> tuple[int, int]:
         """
@@ -99,53 +114,54 @@ class TreePlayer(Player):
                     clone_state.stage = 1
                 classes_of_action = self.games_played.get_classes_of_action(prev_move, clone_state, game_state.turn,
                                                                             True)
-                if frozenset(classes_of_action) in self.games_played.subtrees:
-                    self.games_played = self.games_played.subtrees[frozenset(classes_of_action)]
+                subtree = self.games_played.find_subtree(classes_of_action)
+                if subtree is not None:
+                    self.games_played = subtree
                 else:   # tree has not encountered this situation
                     self.exploring = True
             if self.new_stage:
                 evaluation = self.games_played.get_classes_of_action((0, 0), game_state, game_state.turn, False)
-                if frozenset(evaluation) in self.games_played.subtrees:
-                    self.games_played = self.games_played.subtrees[frozenset(evaluation)]
+                subtree = self.games_played.find_subtree(evaluation)
+                if subtree is not None:
+                    self.games_played = subtree
                 else:   # tree has not encountered this situation
                     self.exploring = True
                 self.new_stage = False
             if prev_move[0] in {ALL_IN_CODE, RAISE_CODE, BET_CODE}:
                 classes_of_action = self.games_played.get_classes_of_action(prev_move, clone_state, game_state.turn,
                                                                             True)
-                if frozenset(classes_of_action) in self.games_played.subtrees:
-                    self.games_played = self.games_played.subtrees[frozenset(classes_of_action)]
+                subtree = self.games_played.find_subtree(classes_of_action)
+                if subtree is not None:
+                    self.games_played = subtree
                 else:  # tree has not encountered this situation
                     self.exploring = True
             self.old_comm_cards = game_state.community_cards
             # search for the best continuation based on confidence values in subtree, now that we know we have
             # encountered similar situations before
-            if not self.exploring:
-                best_so_far = -1
-                subtrees = self.games_played.subtrees
-                for subtree in subtrees:
-                    if best_so_far == -1:
-                        best_so_far = subtree
-                    elif subtrees[best_so_far].move_confidence_value < subtrees[subtree].move_confidence_value:
-                        best_so_far = subtree
+            best_so_far = None if self.exploring else self.games_played.best_subtree()
+            if best_so_far is None:  # tree has no continuation for this situation
+                self.exploring = True
+            else:
+                best_class = tag_names(best_so_far.classes_of_action)[0]  # the player action, if there is one
                 for action in NUM_TO_ACTION:
                     # determine bet sizing if applicable
-                    if NUM_TO_ACTION[action] in list(best_so_far)[0]:
+                    if NUM_TO_ACTION[action] in best_class:
                         degree = -1
-                        if 'Very Aggressive' in list(best_so_far)[0]:
+                        if 'Very Aggressive' in best_class:
                             degree = 4
-                        elif 'Aggressive' in list(best_so_far)[0]:
+                        elif 'Aggressive' in best_class:
                             degree = 3
-                        elif 'Conservative' in list(best_so_far)[0]:
+                        elif 'Conservative' in best_class:
                             degree = 1
-                        elif 'Moderate' in list(best_so_far)[0]:
+                        elif 'Moderate' in best_class:
                             degree = 2
                         final_action = self._final_decision(game_state, action, degree)
                         classes_of_action = self.games_played.get_classes_of_action(final_action, game_state,
                                                                                     game_state.turn,
                                                                                     True)
-                        if frozenset(classes_of_action) in self.games_played.subtrees:
-                            self.games_played = self.games_played.subtrees[frozenset(classes_of_action)]
+                        subtree = self.games_played.find_subtree(classes_of_action)
+                        if subtree is not None:
+                            self.games_played = subtree
                         return final_action
         # if exploring or tree has not encountered this situation, simply make random moves
         if self.exploring:
@@ -213,9 +229,13 @@ class TreePlayer(Player):
         else:
             return min(self.balance, game_state.pool * 8)
 
-    def load_game_tree(self, gametree: str) -> GameTree:
+    def load_game_tree(self, gametree: str) -> Union[GameTree, FrozenGameTree]:
         """
-        Load in sequences of classes of action to the games this player has 'experienced' from a given input file.
+        Load in sequences of classes of action to the games this player has 'experienced' from a given input file,
+        either a game tree file (see tree_file) or a file written by print_to_file. A flat tree file (see frozen_tree)
+        is memory-mapped instead of loaded, as a FrozenGameTree, so the player starts at once but cannot learn. A
+        .shards file is the manifest of a sharded tree (see tree_shards), whose shards are loaded one by one. Game tree
+        files and files written by print_to_file may be compressed (see tree_file.open_tree_file).
 
         Parameters:
         - gametree: the file corresponding to the gametree data needing to be loaded in.
@@ -223,15 +243,28 @@ class TreePlayer(Player):
         Preconditions:
         - gametree is in the same directory of this file
         """
+        if gametree.endswith('.shards'):
+            return load_sharded(gametree)
+        if is_flat_tree_file(gametree):
+            return open_frozen_tree(gametree)
+        if is_tree_file(gametree):
+            return load_tree(gametree)
         gamer = GameTree()
-        reader = open(gametree, 'r')
-        for row in reader:
-            c = row.split('$')
-            c[-1] = c[-1][:-1]  # remove \n
-            gamer.insert_row_moves(c)
+        with open_tree_file(gametree, 'rt') as reader:
+            gamer.insert_rows(reader)
 
         return gamer
 
+    def freeze(self) -> None:
+        """
+        Compiles the game tree of this player into a FrozenGameTree, which is faster to play with and smaller in memory,
+        and stops the player from exploring. The player can no longer learn from its games afterwards.
+        """
+        if isinstance(self.games_played, GameTree):
+            self.games_played = freeze_tree(self.games_played)
+        self.tree_root = None
+        self.exploring = False
+
     def reset_player(self) -> None:
         """
         Resets game variables of the player for when the stage changes.
@@ -239,10 +272,53 @@ class TreePlayer(Player):
         Player.reset_player(self)
         self.new_stage = True
 
+    def reset_hand(self) -> None:
+        """
+        Resets the player for a new round, moving it back to the root of its game tree.
+        """
+        Player.reset_hand(self)
+        if self.tree_root is None:
+            self.tree_root = self.games_played
+            self.explores_by_default = self.exploring
+        self.games_played = self.tree_root
+        self.exploring = self.explores_by_default
+        self.old_comm_cards = set()
+
+
+def save_game_tree(tree: GameTree, destination: str) -> None:
+    """
+    Writes a game tree to a file that TreePlayer can load: with print_to_file if the destination is a .txt file, as a
+    flat tree file (see frozen_tree), which players memory-map for playing, if it is a .flat file, as the manifest of
+    one game tree file per subtree of the root (see tree_shards) if it is a .shards file, and as a game tree file (see
+    tree_file), which stores every node once, otherwise. Text and game tree files are compressed
+    while they are written if the destination also ends in a compression extension (see tree_file.COMPRESSORS), such
+    as destination.tree.xz.
+    Will override ALL existing content in the file.
+
+    Parameters:
+    - tree: the game tree to write
+    - destination: the file destination of the writing
+
+    Preconditions:
+    - tree.classes_of_action is None
+    """
+    name = uncompressed_name(destination)
+    if name.endswith('.txt'):
+        print_to_file(tree, destination)
+    elif name != destination and name.endswith(('.flat', '.shards')):
+        raise ValueError(f'{destination}: flat tree files and sharded trees cannot be compressed')
+    elif name.endswith('.flat'):
+        save_frozen_tree(freeze_tree(tree), destination)
+    elif name.endswith('.shards'):
+        save_sharded(tree, destination)
+    else:
+        save_tree(tree, destination)
+
 
 def print_to_file(tree: GameTree, destination: str) -> None:
     """
-    Writes all sequences of events and confidence statistics for each event to a file.
+    Writes all sequences of events and confidence statistics for each event to a file, compressed if its name ends in
+    a compression extension (see tree_file.open_tree_file).
     Will override ALL existing content in the file.
 
     Parameters:
@@ -252,7 +328,7 @@ def print_to_file(tree: GameTree, destination: str) -> None:
     Preconditions:
     - tree only contains valid sequences of classes of action for the type of poker we are investigating.
     """
-    f = open(destination, "w")
+    f = open_tree_file(destination, "wt")
     tree_to_list_of_strings = _tree_path_to_string(tree)  # retrieve all sequences of events this player has experienced
     for row in tree_to_list_of_strings:
         f.write(row+'\n')
@@ -286,7 +362,8 @@ def _tree_path_to_string(tree: GameTree) -> list[str]:
 if __name__ == '__main__':
     # depending on what you want to do, running this file will do something different
     # - if mode is learning, it will run a specified number of games for the tree player to learn from, and write the
-    #   state of the tree at the end of the simulations to the target file
+    #   state of the tree at the end of the simulations to the target file (in the compact game tree format of
+    #   tree_file, unless the target file is a .txt file)
     # - if the mode is playing, it will use the saved state inside the tree player inside the target file to play a
     #   specified number of games
     # NOTE: IF MODE IS LEARNING, THE TARGET FILE MUST EXIST IN THE DIRECTORY THIS FILE IS BEING RUN IN
@@ -296,54 +373,40 @@ if __name__ == '__main__':
     total_games = 100
 
     if mode == 'learning':
-        all_games = GameTree()
-        # run initial games so the player gets a basic idea of how to play poker
-        naive_games = total_games // 2
-        for i in range(naive_games):
-            p1 = TestingPlayer(10000)
-            result = run_round(p1, NaivePlayer(10000), False)
-            result[-1].check_winner()
-            # print(result[-1])
-            move_sequence = result[-1].get_move_sequence()
-            # learn from both how p1 could have played and how p2 could have played
-            all_games.insert_moves(move_sequence, result, 0)
-            all_games.insert_moves(move_sequence, result, 1)
-
-        # create thresholds for trying new strategies -- the higher the threshold, the likelier a new strategy is to be
-        # attempted
-        game_count = total_games // 2
-        exploration_games = game_count * 3 // 4
-        game_thresholds = []
-        for i in range(0, exploration_games):
-            game_thresholds.append(1 - (i / exploration_games))
-        for _ in range(exploration_games, game_count):
-            game_thresholds.append(-1)
-
-        # run games where new strategies can be attempted and verified for effectiveness
-        for i in range(game_count):
-            p1 = TreePlayer(10000)
-            p1.games_played = copy.copy(all_games)
-            # decide whether to explore new strategies or not
-            p1.exploring = True if random.random() <= game_thresholds[i] else False
-            result = run_round(p1, NaivePlayer(10000), False)
-            result[-1].check_winner()
-            # print(result[-1])
-            move_sequence = result[-1].get_move_sequence()
-            # learn from both how p1 could have played and how p2 could have played
-            all_games.insert_moves(move_sequence, result, 0)
-            all_games.insert_moves(move_sequence, result, 1)
+        # run initial games so the player gets a basic idea of how to play poker, learning from both how p1 could
+        # have played and how p2 could have played on every core
+        # the tree is checkpointed to the log file as it learns, so a crash only loses the last few seconds of
+        # training (recover the tree with tree_checkpoint.load_checkpoint); the checkpoint files are removed once the
+        # tree is saved
+        with TreeCheckpoint(GameTree(), target_file + '.log') as checkpoint:
+            all_games = checkpoint.tree
+            naive_games = total_games // 2
+            train_parallel(naive_games, partial(TestingPlayer, 10000), partial(NaivePlayer, 10000), all_games,
+                           checkpoint=checkpoint)
+
+            # create thresholds for trying new strategies -- the higher the threshold, the likelier a new strategy is
+            # to be attempted
+            game_count = total_games // 2
+            exploration_games = game_count * 3 // 4
+            game_thresholds = []
+            for i in range(0, exploration_games):
+                game_thresholds.append(1 - (i / exploration_games))
+            for _ in range(exploration_games, game_count):
+                game_thresholds.append(-1)
+
+            # run games where new strategies can be attempted and verified for effectiveness, simulated on every core
+            # against a snapshot of the tree that is refreshed as it learns
+            pipeline = TrainingPipeline(partial(TreePlayer, 10000), partial(NaivePlayer, 10000), game_thresholds)
+            pipeline.run(all_games, checkpoint=checkpoint)
 
         # write decision tree result to the target file
-        print_to_file(all_games, target_file)
+        save_game_tree(all_games, target_file)
+        remove_checkpoint(target_file + '.log')
         print('done')
     elif mode == 'playing':
-        tp = TreePlayer(10, target_file)
-        games_played = copy.copy(tp.games_played)
-        for _ in range(total_games):
-            p1 = TreePlayer(10000)
-            p1.games_played = copy.copy(games_played)
-            p1.exploring = False
-            result = run_round(p1, NaivePlayer(10000))
-            result[-1].check_winner()
-            print(f'Player {result[-1].winner} has won the game and {result[-1].pool} currency!')
-            print(result[-1])
+        # play a match where balances carry over from game to game
+        tp = TreePlayer(10000, target_file)
+        tp.freeze()
+        session = Session(tp, NaivePlayer(10000), 100, rebuy_to=10000)
+        session.play(total_games)
+        print(session)
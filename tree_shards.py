@@ -0,0 +1,96 @@
+"""
+DeepPoker Project
+
+This module contains sharded game tree files: a game tree saved as one game tree file (see tree_file) per subtree of its
+root, plus a small manifest. The subtrees of the root split a trained tree into a few large independent parts, so a
+single part can be loaded on its own (see load_shard) without reading the rest of the tree, and each part can be
+replaced or copied as a file of its own. Saving and loading a whole sharded tree takes about as long as saving and
+loading it as a single game tree file.
+
+A manifest is a JSON file holding the game counts of the root and, for every shard in the order of the root's subtrees,
+the name of its file (relative to the manifest) and the names of the classes of action of its subtree.
+
+This file is Copyright (c) 2023 Francis Madarang, Sungjin Hong, Sean Kwee, Yenah Lee
+"""
+from __future__ import annotations
+import json
+import os
+from game_tree import GameTree, tag_names, tags_to_classes
+from tree_file import load_tree, save_tree
+
+
+def save_sharded(tree: GameTree, manifest: str) -> None:
+    """
+    Writes a game tree as a manifest and one shard file per subtree of its root, named after the manifest, overriding
+    their contents.
+
+    Parameters:
+    - tree: the game tree to write
+    - manifest: the file to write the manifest to
+
+    Preconditions:
+    - tree.classes_of_action is None
+    """
+    stem = os.path.splitext(os.path.basename(manifest))[0]
+    directory = os.path.dirname(manifest)
+    files = [f'{stem}.{i}.tree' for i in range(len(tree.subtrees))]
+    for file, subtree in zip(files, tree.subtrees.values()):
+        save_tree(subtree, os.path.join(directory, file))
+    with open(manifest, 'w') as writer:
+        json.dump({'good_outcomes_in_route': tree.good_outcomes_in_route,
+                   'total_games_in_route': tree.total_games_in_route,
+                   'shards': [{'file': file, 'classes_of_action': tag_names(classes_of_action)}
+                              for file, classes_of_action in zip(files, tree.subtrees)]}, writer)
+
+
+def load_sharded(manifest: str) -> GameTree:
+    """
+    Returns the game tree written by save_sharded to the given manifest.
+
+    Parameters:
+    - manifest: the name of the manifest file
+    """
+    contents = _read_manifest(manifest)
+    tree = GameTree()
+    tree.good_outcomes_in_route = contents['good_outcomes_in_route']
+    tree.total_games_in_route = contents['total_games_in_route']
+    for shard in contents['shards']:
+        subtree = load_tree(os.path.join(os.path.dirname(manifest), shard['file']))
+        subtree.classes_of_action = tags_to_classes(shard['classes_of_action'])
+        tree.subtrees[subtree.classes_of_action] = subtree
+    return tree
+
+
+def load_shard(manifest: str, index: int) -> GameTree:
+    """
+    Returns the subtree of the root stored in one shard of the game tree written by save_sharded to the given
+    manifest.
+
+    Parameters:
+    - manifest: the name of the manifest file
+    - index: the index of the shard, which is the index of its subtree in the root's subtrees
+
+    Preconditions:
+    - 0 <= index < the number of shards of the manifest
+    """
+    shard = _read_manifest(manifest)['shards'][index]
+    subtree = load_tree(os.path.join(os.path.dirname(manifest), shard['file']))
+    subtree.classes_of_action = tags_to_classes(shard['classes_of_action'])
+    return subtree
+
+
+def _read_manifest(manifest: str) -> dict:
+    """
+    Returns the contents of a manifest file.
+    """
+    with open(manifest, 'r') as reader:
+        return json.load(reader)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'json', 'os', 'game_tree', 'tree_file'],
+        'allowed-io': ['save_sharded', '_read_manifest'],
+        'max-line-length': 120
+    })
@@ -0,0 +1,154 @@
+"""
+DeepPoker Project
+
+This module contains background snapshots of a game tree being trained. Taking a snapshot forks a child process, which
+gets a copy-on-write copy of the whole tree at that moment and writes it to a file while the parent keeps training, so
+the training loop only waits for the fork (a few milliseconds even for large trees) instead of for the tree to be
+written. On platforms without fork, snapshots are written in the training loop instead.
+
+This file is Copyright (c) 2023 Francis Madarang, Sungjin Hong, Sean Kwee, Yenah Lee
+"""
+from __future__ import annotations
+from typing import Callable, Optional
+import os
+import pickle
+import time
+from game_tree import GameTree
+
+
+def pickle_tree(tree: GameTree, destination: str) -> None:
+    """
+    Writes a game tree to a file with pickle, overriding its contents.
+    """
+    with open(destination, 'wb') as writer:
+        pickle.dump(tree, writer, pickle.HIGHEST_PROTOCOL)
+
+
+class TreeSnapshotter:
+    """
+    Takes snapshots of a game tree being trained, written to a file in the background. At most one snapshot is written
+    at a time, and the file is replaced atomically, so readers never see a half-written snapshot.
+
+    Instance Attributes:
+    - file: the file snapshots are written to
+    - write: the function writing a tree to a file, such as pickle_tree or tree_file.save_tree
+    - snapshots_started: the number of snapshots started
+    - snapshots_written: the number of snapshots finished writing
+    - stall_seconds: the seconds the training loop waited while taking snapshots, in total
+    - max_stall_seconds: the longest the training loop waited while taking a snapshot
+
+    Representation Invariants:
+    - 0 <= self.snapshots_written <= self.snapshots_started
+    - 0.0 <= self.max_stall_seconds <= self.stall_seconds
+    """
+    file: str
+    write: Callable[[GameTree, str], None]
+    snapshots_started: int
+    snapshots_written: int
+    stall_seconds: float
+    max_stall_seconds: float
+    _child: Optional[int]
+    _unreported: bool
+
+    def __init__(self, file: str, write: Callable[[GameTree, str], None] = pickle_tree) -> None:
+        """
+        Initializer for a snapshotter writing to the given file with the given function.
+        """
+        self.file = file
+        self.write = write
+        self.snapshots_started = 0
+        self.snapshots_written = 0
+        self.stall_seconds = 0.0
+        self.max_stall_seconds = 0.0
+        self._child = None
+        self._unreported = False
+
+    def busy(self) -> bool:
+        """
+        Returns whether a snapshot is still being written.
+        """
+        return self._child is not None and not self.poll()
+
+    def start(self, tree: GameTree) -> bool:
+        """
+        Starts writing a snapshot of the tree as it is now, and returns True, unless a snapshot is still being written,
+        in which case no snapshot is taken and False is returned.
+        """
+        if self.busy():
+            return False
+        start = time.perf_counter()
+        self.snapshots_started += 1
+        if not hasattr(os, 'fork'):
+            self._write(tree)
+            self.snapshots_written += 1
+            self._unreported = True
+        else:
+            pid = os.fork()
+            if pid == 0:  # the child writes its copy of the tree and exits without running any of the parent's code
+                exit_code = 1
+                try:
+                    self._write(tree)
+                    exit_code = 0
+                finally:
+                    os._exit(exit_code)
+            self._child = pid
+        stall = time.perf_counter() - start
+        self.stall_seconds += stall
+        self.max_stall_seconds = max(self.max_stall_seconds, stall)
+        return True
+
+    def poll(self) -> bool:
+        """
+        Returns whether the last snapshot started has been written, raising an error if writing it failed.
+        """
+        if self._child is None:
+            return True
+        pid, status = os.waitpid(self._child, os.WNOHANG)
+        if pid == 0:
+            return False
+        self._finish(status)
+        return True
+
+    def finished(self) -> bool:
+        """
+        Returns whether a snapshot has finished writing since the last call, whether it was written in the background
+        or, without fork, by start itself, raising an error if writing it failed.
+        """
+        self.poll()
+        finished = self._unreported
+        self._unreported = False
+        return finished
+
+    def wait(self) -> None:
+        """
+        Waits until the last snapshot started has been written, raising an error if writing it failed.
+        """
+        if self._child is not None:
+            self._finish(os.waitpid(self._child, 0)[1])
+
+    def _finish(self, status: int) -> None:
+        """
+        Records that the child writing a snapshot exited with the given wait status.
+        """
+        self._child = None
+        if os.waitstatus_to_exitcode(status) != 0:
+            raise RuntimeError(f'writing a snapshot to {self.file} failed')
+        self.snapshots_written += 1
+        self._unreported = True
+
+    def _write(self, tree: GameTree) -> None:
+        """
+        Writes the tree to the snapshot file through a temporary file.
+        """
+        self.write(tree, self.file + '.tmp')
+        os.replace(self.file + '.tmp', self.file)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'extra-imports': ['__future__', 'typing', 'os', 'pickle', 'time', 'game_tree'],
+        'allowed-io': ['pickle_tree'],
+        'max-line-length': 120,
+        'disable': ['W0212']  # the child has to exit without cleaning up the parent's state
+    })